@@ -1,9 +1,9 @@
 import os.path
 import random
+import numpy as np
 import torchvision.transforms as transforms
-import torch
-from data.base_dataset import BaseDataset
-from data.image_folder import make_dataset
+from data.base_dataset import BaseDataset, get_draft_size, rgb_to_gray, array_to_tensor, array_to_uint8_tensor
+from data.image_folder import make_dataset, default_loader
 from PIL import Image
 
 
@@ -17,29 +17,40 @@ class AlignedDataset(BaseDataset):
 
         assert(opt.resize_or_crop == 'resize_and_crop')
 
-        transform_list = [transforms.ToTensor(),
-                          transforms.Normalize((0.5, 0.5, 0.5),
-                                               (0.5, 0.5, 0.5))]
-
-        self.transform = transforms.Compose(transform_list)
+        self.draft_size = get_draft_size(opt)
 
     def __getitem__(self, index):
         AB_path = self.AB_paths[index]
-        AB = Image.open(AB_path).convert('RGB')
+        AB = default_loader(AB_path, self.draft_size)
         AB = AB.resize((self.opt.loadSize * 2, self.opt.loadSize), Image.BICUBIC)
-        AB = self.transform(AB)
-
-        w_total = AB.size(2)
-        w = int(w_total / 2)
-        h = AB.size(1)
+        if self.opt.batch_augment:
+            # uint8 halves, cropped and flipped together by BatchAugment
+            AB = transforms.functional.pil_to_tensor(AB)
+            return {'A': AB[:, :, :self.opt.loadSize], 'B': AB[:, :, self.opt.loadSize:],
+                    'A_paths': AB_path, 'B_paths': AB_path}
+        # crop and flip views of the uint8 image, only the crops are converted
+        AB = np.asarray(AB)
+        h = AB.shape[0]
+        w = int(AB.shape[1] / 2)
         w_offset = random.randint(0, max(0, w - self.opt.fineSize - 1))
         h_offset = random.randint(0, max(0, h - self.opt.fineSize - 1))
 
-        A = AB[:, h_offset:h_offset + self.opt.fineSize,
+        A = AB[h_offset:h_offset + self.opt.fineSize,
                w_offset:w_offset + self.opt.fineSize]
-        B = AB[:, h_offset:h_offset + self.opt.fineSize,
+        B = AB[h_offset:h_offset + self.opt.fineSize,
                w + w_offset:w + w_offset + self.opt.fineSize]
 
+        if (not self.opt.no_flip) and random.random() < 0.5:
+            A = A[:, ::-1]
+            B = B[:, ::-1]
+
+        if self.opt.uint8_transport:
+            A = array_to_uint8_tensor(A)
+            B = array_to_uint8_tensor(B)
+        else:
+            A = array_to_tensor(A)
+            B = array_to_tensor(B)
+
         if self.opt.which_direction == 'BtoA':
             input_nc = self.opt.output_nc
             output_nc = self.opt.input_nc
@@ -47,19 +58,11 @@ class AlignedDataset(BaseDataset):
             input_nc = self.opt.input_nc
             output_nc = self.opt.output_nc
 
-        if (not self.opt.no_flip) and random.random() < 0.5:
-            idx = [i for i in range(A.size(2) - 1, -1, -1)]
-            idx = torch.LongTensor(idx)
-            A = A.index_select(2, idx)
-            B = B.index_select(2, idx)
-
         if input_nc == 1:  # RGB to gray
-            tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-            A = tmp.unsqueeze(0)
+            A = rgb_to_gray(A)
 
         if output_nc == 1:  # RGB to gray
-            tmp = B[0, ...] * 0.299 + B[1, ...] * 0.587 + B[2, ...] * 0.114
-            B = tmp.unsqueeze(0)
+            B = rgb_to_gray(B)
     
         return {'A': A, 'B': B,
                 'A_paths': AB_path, 'B_paths': AB_path}
@@ -1,3 +1,7 @@
+import math
+import random
+import numpy as np
+import torch
 import torch.utils.data as data
 from PIL import Image
 import torchvision.transforms as transforms
@@ -14,6 +18,13 @@ class BaseDataset(data.Dataset):
 
 def get_transform(opt):
     transform_list = []
+    if opt.batch_augment:
+        # resize only, crop/flip/normalize run on the batch (data/batch_transforms.py)
+        assert(opt.resize_or_crop == 'resize_and_crop')
+        osize = [opt.loadSize, opt.loadSize]
+        return transforms.Compose([transforms.Resize(osize, Image.BICUBIC),
+                                   transforms.PILToTensor()])
+
     if opt.resize_or_crop == 'resize_and_crop':
         print (opt.phase)
         if opt.phase == 'train':
@@ -36,11 +47,30 @@ def get_transform(opt):
     if opt.isTrain and not opt.no_flip:
         transform_list.append(transforms.RandomHorizontalFlip())
 
-    transform_list += [transforms.ToTensor(),
-                       transforms.Normalize((0.5, 0.5, 0.5),
-                                            (0.5, 0.5, 0.5))]
+    if opt.uint8_transport:
+        # normalized by the model in set_input
+        transform_list.append(transforms.PILToTensor())
+    else:
+        transform_list += [transforms.ToTensor(),
+                           transforms.Normalize((0.5, 0.5, 0.5),
+                                                (0.5, 0.5, 0.5))]
     return transforms.Compose(transform_list)
 
+# 3xHxW RGB to 1xHxW gray, uint8 images (--uint8_transport) stay uint8
+def rgb_to_gray(tensor):
+    tmp = tensor[0, ...] * 0.299 + tensor[1, ...] * 0.587 + tensor[2, ...] * 0.114
+    if tensor.dtype == torch.uint8:
+        tmp = tmp.round_().to(torch.uint8)
+    return tmp.unsqueeze(0)
+
+# size the loaded image is resized to before any crop, used for JPEG draft decoding
+def get_draft_size(opt):
+    if opt.no_draft or opt.resize_or_crop != 'resize_and_crop':
+        return None
+    if opt.dataset_mode == 'aligned':
+        return (opt.loadSize * 2, opt.loadSize)
+    return (opt.loadSize, opt.loadSize)
+
 def __scale_width(img, target_width):
     ow, oh = img.size
     if (ow == target_width):
@@ -48,3 +78,68 @@ def __scale_width(img, target_width):
     w = target_width
     h = int(target_width * oh / ow)
     return img.resize((w, h), Image.BICUBIC)
+
+# Fit img to a (w, h) aspect-ratio bucket (data/samplers.py): scale it to
+# width w, then crop or reflect-pad its height to h. Images much shorter than
+# the bucket (B images paired with an A bucket) are scaled to cover it and
+# cropped in width instead. Crops are random when training, centered otherwise.
+def fit_to_size(img, size, opt):
+    w, h = size
+    ow, oh = img.size
+    sw, sh = w, int(w * oh / float(ow))
+    if sh + opt.bucket_step <= h:
+        sw, sh = int(math.ceil(h * ow / float(oh))), h
+    if (sw, sh) != (ow, oh):
+        img = img.resize((sw, sh), Image.BICUBIC)
+    arr = np.asarray(img)
+    offsets = []
+    for length, target in [(sh, h), (sw, w)]:
+        if length <= target:
+            offsets.append(0)
+        elif opt.isTrain:
+            offsets.append(random.randint(0, length - target))
+        else:
+            offsets.append((length - target) // 2)
+    arr = arr[offsets[0]:offsets[0] + h, offsets[1]:offsets[1] + w]
+    if sh < h:
+        pad = h - sh
+        arr = np.pad(arr, ((pad // 2, pad - pad // 2), (0, 0), (0, 0)),
+                     'reflect' if pad < sh else 'edge')
+    return Image.fromarray(arr)
+
+# Crop and flip an HxWx3 uint8 array the same way get_transform does for
+# resize_and_crop, working on views so only the final crop is copied.
+def crop_flip_array(arr, opt):
+    return crop_flip_arrays([arr], opt)[0]
+
+# the same random crop and flip of every H x W (x C) array in arrs,
+# e.g. an image and its edge map
+def crop_flip_arrays(arrs, opt):
+    if opt.phase == 'train':
+        h, w = arrs[0].shape[:2]
+        h_offset = random.randint(0, h - opt.fineSize)
+        w_offset = random.randint(0, w - opt.fineSize)
+        arrs = [arr[h_offset:h_offset + opt.fineSize, w_offset:w_offset + opt.fineSize] for arr in arrs]
+    if opt.isTrain and not opt.no_flip and random.random() < 0.5:
+        arrs = [arr[:, ::-1] for arr in arrs]
+    return arrs
+
+# HxWx3 uint8 array to a CxHxW uint8 tensor
+def array_to_uint8_tensor(arr):
+    return torch.from_numpy(np.ascontiguousarray(arr.transpose(2, 0, 1)))
+
+# loadSize x loadSize x 3 uint8 array (packed store, shared cache) to the tensor
+# get_transform would give for resize_and_crop
+def array_transform(arr, opt):
+    if opt.batch_augment:
+        return array_to_uint8_tensor(arr)
+    arr = crop_flip_array(arr, opt)
+    if opt.uint8_transport:
+        return array_to_uint8_tensor(arr)
+    return array_to_tensor(arr)
+
+# HxWx3 uint8 array to a normalized CxHxW float tensor,
+# same result as ToTensor() followed by Normalize((0.5,)*3, (0.5,)*3)
+def array_to_tensor(arr):
+    tensor = torch.from_numpy(arr.transpose(2, 0, 1).astype(np.float32, order='C'))
+    return tensor.div_(127.5).sub_(1.0)
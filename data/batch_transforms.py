@@ -0,0 +1,131 @@
+###############################################################################
+# Batch-level augmentation.
+# With --batch_augment the datasets only resize to loadSize and return uint8
+# tensors. Random crop, horizontal flip, [-1, 1] normalization and the
+# optional grayscale conversion are then done here on the collated batch, in
+# the training process and on the device of the model, with one gather per
+# batch instead of per-sample Python transforms in the workers.
+# With --uint8_transport as well, batches stay uint8 and are normalized by the
+# model in set_input.
+# --max_rotation adds random rotations of the whole batch with one grid_sample,
+# instead of writing rotated copies of the training images to disk
+# (image-preprocessing aug).
+###############################################################################
+
+import math
+
+import torch
+import torch.nn.functional as F
+
+
+def crop_flip(images, h_offsets, w_offsets, flips, size):
+    """Crop a size x size window at the given offsets out of every image of a
+    N x C x H x W batch, mirroring the windows where flips is True."""
+    n = images.size(0)
+    ar = torch.arange(size, device=images.device)
+    rows = h_offsets[:, None] + ar
+    cols = w_offsets[:, None] + torch.where(flips[:, None], size - 1 - ar, ar)
+    batch_idx = torch.arange(n, device=images.device)[:, None, None]
+    # advanced indices around the channel slice give a N x size x size x C result
+    crops = images[batch_idx, :, rows[:, :, None], cols[:, None, :]]
+    return crops.permute(0, 3, 1, 2)
+
+
+def border_mean(images):
+    """N x C mean of the nonzero pixels on the border of every image."""
+    border = torch.cat([images[:, :, 0, :-1], images[:, :, -1, 1:],
+                        images[:, :, :-1, -1], images[:, :, 1:, 0]], 2).float()
+    nonzero = (border != 0).float()
+    return (border * nonzero).sum(2) / nonzero.sum(2).clamp(min=1)
+
+
+def rotate(images, angles):
+    """Rotate every image of a N x C x H x W batch about its center by its
+    angle in degrees, counter-clockwise like cv2.getRotationMatrix2D. Uncovered corners are filled with the border mean of the
+    image, like image-preprocessing/augmentation.random_rotation."""
+    n, _, h, w = images.size()
+    x = images.float()
+    fill = border_mean(x)[:, :, None, None]
+    theta = angles.float() * (math.pi / 180)
+    cos, sin = theta.cos(), theta.sin()
+    zeros = torch.zeros_like(cos)
+    # rotation in pixel units, expressed in the normalized coordinates of affine_grid
+    matrix = torch.stack([torch.stack([cos, -sin * h / w, zeros], 1),
+                          torch.stack([sin * w / h, cos, zeros], 1)], 1)
+    grid = F.affine_grid(matrix, list(x.size()), align_corners=False)
+    # zero padding around (x - fill) is padding with fill around x
+    rotated = F.grid_sample(x - fill, grid, mode='bilinear', padding_mode='zeros',
+                            align_corners=False) + fill
+    if images.dtype == torch.uint8:
+        rotated = rotated.round_().clamp_(0, 255).to(torch.uint8)
+    return rotated
+
+
+def normalize(images):
+    # uint8 [0, 255] -> float [-1, 1], same as ToTensor + Normalize((0.5,)*3, (0.5,)*3)
+    return images.float().div_(127.5).sub_(1.0)
+
+
+def rgb_to_gray(images):
+    gray = images[:, 0:1] * 0.299 + images[:, 1:2] * 0.587 + images[:, 2:3] * 0.114
+    if images.dtype == torch.uint8:
+        gray = gray.round_().to(torch.uint8)
+    return gray
+
+
+class BatchAugment():
+    def __init__(self, opt):
+        self.opt = opt
+        if len(opt.gpu_ids) > 0:
+            self.device = torch.device('cuda', opt.gpu_ids[0])
+        else:
+            self.device = torch.device('cpu')
+        # aligned A/B halves share their crop and flip
+        self.paired = opt.dataset_mode == 'aligned'
+        if opt.which_direction == 'BtoA':
+            self.input_nc = opt.output_nc
+            self.output_nc = opt.input_nc
+        else:
+            self.input_nc = opt.input_nc
+            self.output_nc = opt.output_nc
+
+    def get_params(self, images):
+        n, _, h, w = images.size()
+        size = self.opt.fineSize
+        if self.opt.phase == 'train':
+            h_offsets = torch.randint(0, h - size + 1, (n,), device=self.device)
+            w_offsets = torch.randint(0, w - size + 1, (n,), device=self.device)
+        else:
+            h_offsets = torch.zeros(n, dtype=torch.long, device=self.device)
+            w_offsets = torch.zeros(n, dtype=torch.long, device=self.device)
+            size = min(h, w)
+        if self.opt.isTrain and not self.opt.no_flip:
+            flips = torch.rand(n, device=self.device) < 0.5
+        else:
+            flips = torch.zeros(n, dtype=torch.bool, device=self.device)
+        angles = None
+        if self.opt.isTrain and self.opt.max_rotation > 0:
+            angles = (torch.rand(n, device=self.device) * 2 - 1) * self.opt.max_rotation
+        return h_offsets, w_offsets, flips, size, angles
+
+    def apply(self, images, params, nc):
+        h_offsets, w_offsets, flips, size, angles = params
+        if angles is not None:
+            images = rotate(images, angles)
+        images = crop_flip(images, h_offsets, w_offsets, flips, size)
+        if not self.opt.uint8_transport:
+            images = normalize(images)
+        if nc == 1:  # RGB to gray
+            images = rgb_to_gray(images)
+        return images
+
+    def __call__(self, data):
+        A = data['A'].to(self.device, non_blocking=True)
+        params = self.get_params(A)
+        data['A'] = self.apply(A, params, self.input_nc)
+        if 'B' in data:
+            B = data['B'].to(self.device, non_blocking=True)
+            if not self.paired:
+                params = self.get_params(B)
+            data['B'] = self.apply(B, params, self.output_nc)
+        return data
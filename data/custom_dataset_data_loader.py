@@ -13,11 +13,29 @@ def CreateDataset(opt):
     elif opt.dataset_mode == 'single':
         from data.single_dataset import SingleDataset
         dataset = SingleDataset()
+    elif opt.dataset_mode == 'packed':
+        from data.packed_dataset import PackedDataset
+        dataset = PackedDataset()
+    elif opt.dataset_mode == 'shards':
+        from data.shard_dataset import ShardDataset
+        dataset = ShardDataset()
+    elif opt.dataset_mode == 'stream':
+        from data.stream_dataset import StreamDataset
+        dataset = StreamDataset()
     else:
         raise ValueError("Dataset [%s] not recognized." % opt.dataset_mode)
 
     print("dataset [%s] was created" % (dataset.name()))
+    # selected before the workers are forked, which inherit it
+    from data.decoders import set_decoder
+    set_decoder(opt)
     dataset.initialize(opt)
+    if opt.isTrain and opt.num_crops > 1:
+        from data.multi_crop_dataset import MultiCropDataset
+        multi_crop = MultiCropDataset()
+        multi_crop.initialize(opt, dataset)
+        print("dataset [%s] was created" % (multi_crop.name()))
+        return multi_crop
     return dataset
 
 
@@ -28,20 +46,94 @@ class CustomDatasetDataLoader(BaseDataLoader):
     def initialize(self, opt):
         BaseDataLoader.initialize(self, opt)
         self.dataset = CreateDataset(opt)
+        # iterable datasets shuffle themselves
+        iterable = isinstance(self.dataset, torch.utils.data.IterableDataset)
+        shuffle = not opt.serial_batches and not iterable
+        data_kwargs = {'batch_size': opt.batchSize, 'shuffle': shuffle}
+        self.sampler = None
+        # datasets that shuffle themselves are told the epoch like a sampler
+        if hasattr(self.dataset, 'set_epoch'):
+            self.sampler = self.dataset
+        # limit on the number of batches per epoch
+        self.max_batches = opt.max_dataset_size
+        self.num_samples = None
+        if opt.bucket_batches:
+            assert(opt.resize_or_crop == 'scale_width')
+            assert(opt.dataset_mode in ['unaligned', 'single'])
+            from data.manifest import image_sizes
+            from data.samplers import BucketBatchSampler, bucket_size
+            image_size = image_sizes(self.dataset.dir_A)
+            sizes = []
+            for path in self.dataset.A_paths:
+                w, h = image_size[path]
+                # the manifest records unreadable images as 0 x 0
+                if w <= 0 or h <= 0:
+                    raise RuntimeError('cannot read the size of %s, remove or fix the image' % path)
+                sizes.append(bucket_size(w, h, opt.fineSize, opt.bucket_step, pad_only=not opt.isTrain))
+            self.sampler = BucketBatchSampler(sizes, opt.batchSize, shuffle=shuffle)
+            print('%d aspect ratio buckets' % len(self.sampler.buckets))
+            data_kwargs = {'batch_sampler': self.sampler}
+            # the buckets only hold the A images
+            self.num_samples = len(sizes)
+        elif opt.dataset_mode in ['unaligned', 'packed'] and not iterable:
+            from data.samplers import UnalignedSampler, get_world
+            if opt.unaligned_sampler or get_world()[0] > 1:
+                self.sampler = UnalignedSampler(self.dataset.A_size, self.dataset.B_size,
+                                                opt.max_dataset_size, shuffle=shuffle)
+                # the sampler does the shuffling and applies max_dataset_size
+                data_kwargs = {'batch_size': opt.batchSize, 'sampler': self.sampler}
+                self.max_batches = float('inf')
+                self.num_samples = len(self.sampler)
+        # one endless pass over the data instead of epochs, see train.py
+        self.by_iteration = opt.isTrain and opt.by_iteration
+        if self.by_iteration and not iterable:
+            from data.samplers import InfiniteSampler
+            if 'batch_sampler' in data_kwargs:
+                self.sampler = InfiniteSampler(self.sampler, start_epoch=opt.epoch_count)
+                data_kwargs = {'batch_sampler': self.sampler}
+            else:
+                if self.sampler is None:
+                    size = int(min(len(self.dataset), opt.max_dataset_size))
+                    self.sampler = InfiniteSampler(size=size, shuffle=shuffle, start_epoch=opt.epoch_count)
+                else:
+                    self.sampler = InfiniteSampler(self.sampler, start_epoch=opt.epoch_count)
+                data_kwargs = {'batch_size': opt.batchSize, 'sampler': self.sampler}
+            self.max_batches = float('inf')
+        if opt.autotune_loader:
+            from data.loader_tuner import tune_loader
+            loader_kwargs = tune_loader(self.dataset, opt, data_kwargs)
+        else:
+            loader_kwargs = {'num_workers': int(opt.nThreads)}
+        if self.by_iteration and loader_kwargs['num_workers'] > 0:
+            # iterable datasets are restarted at the end of a pass, keep their workers
+            loader_kwargs['persistent_workers'] = True
         self.dataloader = torch.utils.data.DataLoader(
             self.dataset,
-            batch_size=opt.batchSize,
-            shuffle=not opt.serial_batches,
-            num_workers=int(opt.nThreads))
+            **dict(data_kwargs, **loader_kwargs))
+        self.batch_transform = None
+        if opt.batch_augment:
+            from data.batch_transforms import BatchAugment
+            self.batch_transform = BatchAugment(opt)
 
     def load_data(self):
         return self
 
+    def set_epoch(self, epoch):
+        if self.sampler is not None:
+            self.sampler.set_epoch(epoch)
+
     def __len__(self):
+        if self.num_samples is not None:
+            return self.num_samples
         return min(len(self.dataset), self.opt.max_dataset_size)
 
     def __iter__(self):
-        for i, data in enumerate(self.dataloader):
-            if i >= self.opt.max_dataset_size:
+        while True:
+            for i, data in enumerate(self.dataloader):
+                if i >= self.max_batches:
+                    break
+                if self.batch_transform is not None:
+                    data = self.batch_transform(data)
+                yield data
+            if not self.by_iteration:
                 break
-            yield data
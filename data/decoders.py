@@ -0,0 +1,192 @@
+###############################################################################
+# Image decoder backends.
+# default_loader, zip_loader and the shards dataset decode through decode_image,
+# which picks a backend per file extension:
+#   pil         : PIL, with JPEG draft (DCT scaled) decoding
+#   opencv      : cv2.imdecode, with IMREAD_REDUCED_COLOR_2/4/8 for draft sizes
+#   torchvision : torchvision.io.decode_image (libjpeg-turbo / libpng)
+# Every backend returns an RGB PIL image, so the transforms stay the same.
+# --decoder auto benchmarks the available backends on the file types of the
+# dataset and caches the fastest one per extension in
+# ~/.cache/dlp_gan/decoders.json (python -m util.benchmark decoders prints the
+# measurements and refreshes the cache).
+###############################################################################
+
+import io
+import json
+import os
+import random
+import socket
+import time
+
+import numpy as np
+from PIL import Image
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'dlp_gan', 'decoders.json')
+
+# extension -> backend, '' is the default
+_choice = {'': 'pil'}
+
+
+def _draft_scale(size, draft_size):
+    # largest 1/2, 1/4 or 1/8 reduction that keeps the image >= draft_size
+    for scale in [8, 4, 2]:
+        if size[0] // scale >= draft_size[0] and size[1] // scale >= draft_size[1]:
+            return scale
+    return 1
+
+
+def pil_decode(data, draft_size=None):
+    from data.image_folder import open_image
+    return open_image(Image.open(io.BytesIO(data)), draft_size)
+
+
+def opencv_decode(data, draft_size=None):
+    import cv2
+    flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+             4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+    scale = 1
+    if draft_size is not None:
+        # the header gives the size without decoding
+        scale = _draft_scale(Image.open(io.BytesIO(data)).size, draft_size)
+    # PIL does not apply the EXIF orientation either
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags[scale] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        raise IOError('opencv cannot decode image')
+    return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
+
+def torchvision_decode(data, draft_size=None):
+    import torch
+    from torchvision.io import decode_image as tv_decode_image, ImageReadMode
+    tensor = tv_decode_image(torch.frombuffer(bytearray(data), dtype=torch.uint8), mode=ImageReadMode.RGB)
+    return Image.fromarray(tensor.permute(1, 2, 0).numpy())
+
+
+DECODERS = {'pil': pil_decode, 'opencv': opencv_decode, 'torchvision': torchvision_decode}
+
+
+def available_decoders():
+    names = ['pil']
+    try:
+        import cv2
+        names.append('opencv')
+    except ImportError:
+        pass
+    try:
+        from torchvision.io import decode_image
+        names.append('torchvision')
+    except ImportError:
+        pass
+    return names
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def decoder_for(path):
+    return _choice.get(_extension(path), _choice[''])
+
+
+def decode_image(data, path, draft_size=None):
+    """Decode the encoded bytes of the image file path to an RGB PIL image."""
+    return DECODERS[decoder_for(path)](data, draft_size)
+
+
+def load_image(path, draft_size=None):
+    if decoder_for(path) == 'pil':
+        from data.image_folder import open_image
+        return open_image(Image.open(path), draft_size)
+    with open(path, 'rb') as f:
+        return decode_image(f.read(), path, draft_size)
+
+
+def benchmark_decoders(paths, draft_size=None, num_images=50, repeat=2):
+    """Return ({extension: fastest backend}, {extension: {backend: ms/image}})
+    measured on up to num_images files per extension, decoding and resizing
+    to draft_size like the datasets do."""
+    from data.image_folder import read_bytes
+    by_ext = {}
+    for path in paths:
+        by_ext.setdefault(_extension(path), []).append(path)
+    choice = {}
+    timings = {}
+    for ext, ext_paths in sorted(by_ext.items()):
+        sample = random.Random(0).sample(ext_paths, min(num_images, len(ext_paths)))
+        encoded = [read_bytes(path) for path in sample]
+        timings[ext] = {}
+        for name in available_decoders():
+            try:
+                best = float('inf')
+                for _ in range(repeat):
+                    start_time = time.time()
+                    for data in encoded:
+                        img = DECODERS[name](data, draft_size)
+                        if draft_size is not None:
+                            # backends without DCT scaling pay for it here
+                            img.resize(draft_size, Image.BICUBIC)
+                    best = min(best, (time.time() - start_time) / len(encoded))
+            except Exception as e:
+                print('decoder %s cannot decode %s files: %s' % (name, ext, e))
+                continue
+            timings[ext][name] = best * 1000
+        choice[ext] = min(timings[ext], key=timings[ext].get)
+    return choice, timings
+
+
+def _cache_key(dataroot, draft_size):
+    return '|'.join(str(v) for v in [socket.gethostname(), os.path.abspath(dataroot), draft_size])
+
+
+def _read_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def record_choice(dataroot, draft_size, choice, timings):
+    cache = _read_cache()
+    cache[_cache_key(dataroot, draft_size)] = {'decoders': choice, 'ms_per_image': timings}
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        with open(CACHE_PATH + '.tmp', 'w') as f:
+            json.dump(cache, f, indent=1)
+        os.replace(CACHE_PATH + '.tmp', CACHE_PATH)
+    except (IOError, OSError) as e:
+        print('could not write decoder cache %s: %s' % (CACHE_PATH, e))
+
+
+def dataset_paths(opt):
+    """Image paths of the folders the dataset mode of opt reads from."""
+    from data.image_folder import make_dataset
+    from data.zip_folder import is_zip_path
+    dirs = [os.path.join(opt.dataroot, opt.phase + 'A'), os.path.join(opt.dataroot, opt.phase + 'B'),
+            os.path.join(opt.dataroot, opt.phase)]
+    dirs = [d for d in dirs if os.path.isdir(d) or is_zip_path(d)] or [opt.dataroot]
+    paths = []
+    for d in dirs:
+        paths += make_dataset(d)
+    return paths
+
+
+def set_decoder(opt):
+    """Select the backends for opt.decoder; auto uses the recorded benchmark
+    result for the dataset or runs the benchmark."""
+    global _choice
+    if opt.decoder != 'auto':
+        _choice = {'': opt.decoder}
+        return
+    from data.base_dataset import get_draft_size
+    draft_size = get_draft_size(opt)
+    entry = _read_cache().get(_cache_key(opt.dataroot, draft_size))
+    if entry is None:
+        print('benchmarking image decoders...')
+        choice, timings = benchmark_decoders(dataset_paths(opt), draft_size)
+        record_choice(opt.dataroot, draft_size, choice, timings)
+    else:
+        choice = entry['decoders']
+    _choice = dict(choice, **{'': 'pil'})
+    print('image decoders: %s' % ', '.join('%s %s' % (ext, name) for ext, name in sorted(choice.items())))
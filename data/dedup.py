@@ -0,0 +1,152 @@
+###############################################################################
+# Near-duplicate removal.
+# Every image gets a 64-bit DCT perceptual hash (computed in parallel and
+# cached in the dataset manifest, see data/manifest.py). Images whose hashes
+# differ in at most --threshold bits are linked and the links are merged into
+# clusters with union-find. From every cluster the image with the most pixels
+# is kept; the others are written to <dir>.exclude.txt next to the folder,
+# which UnalignedDataset skips.
+#
+# The search is a multi-index hash: the 64 bits are split into threshold + 1
+# chunks, and two hashes within threshold bits of each other must agree
+# exactly on at least one chunk, so only images sharing a chunk value are
+# compared.
+#
+# Usage:
+#   python -m data.dedup --dataroot ./datasets/lhq_1024 --phase train --threshold 4
+###############################################################################
+
+import argparse
+import os
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image
+
+from data.image_folder import default_loader
+from data.manifest import manifest_hashes, manifest_records
+
+EXCLUDE_SUFFIX = '.exclude.txt'
+HASH_SIZE = 8
+DCT_SIZE = 32
+
+# orthogonal DCT-II basis, DCT_SIZE x DCT_SIZE
+_k = np.arange(DCT_SIZE)
+_DCT = np.cos(np.pi * (2 * _k[None, :] + 1) * _k[:, None] / (2 * DCT_SIZE))
+# popcount of every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def phash(path):
+    """64-bit DCT perceptual hash as a hex string, None if the image cannot be read."""
+    try:
+        img = default_loader(path, (DCT_SIZE, DCT_SIZE))
+    except (IOError, OSError):
+        return None
+    img = np.asarray(img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.BILINEAR), dtype=np.float64)
+    dct = _DCT.dot(img).dot(_DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # the DC term says nothing about the structure of the image
+    bits = dct > np.median(dct[1:])
+    return '%016x' % int(''.join('1' if b else '0' for b in bits), 2)
+
+
+def hamming(a, b):
+    """Bitwise distances between two arrays of uint64 hashes."""
+    return _POPCOUNT[np.bitwise_xor(a, b).view(np.uint8)].reshape(-1, 8).sum(1)
+
+
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def duplicate_clusters(hashes, threshold):
+    """Clusters (lists of indices, size > 1) of the uint64 hashes that are
+    connected by pairs within threshold bits."""
+    n = len(hashes)
+    parent = list(range(n))
+    num_chunks = threshold + 1
+    bounds = np.linspace(0, 64, num_chunks + 1).astype(int)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        chunks = (hashes >> np.uint64(lo)) & np.uint64((1 << int(hi - lo)) - 1)
+        order = np.argsort(chunks, kind='stable')
+        sorted_chunks = chunks[order]
+        # compare every hash with the ones d places further in chunk order,
+        # until no two hashes d places apart share their chunk value
+        d = 1
+        while d < n:
+            same = np.flatnonzero(sorted_chunks[d:] == sorted_chunks[:-d])
+            if len(same) == 0:
+                break
+            a, b = order[same], order[same + d]
+            close = hamming(hashes[a], hashes[b]) <= threshold
+            for i, j in zip(a[close].tolist(), b[close].tolist()):
+                i, j = find(parent, i), find(parent, j)
+                if i != j:
+                    parent[i] = j
+            d += 1
+    clusters = defaultdict(list)
+    for i in range(n):
+        clusters[find(parent, i)].append(i)
+    return [c for c in clusters.values() if len(c) > 1]
+
+
+def exclusion_path(dir):
+    return os.path.normpath(dir) + EXCLUDE_SUFFIX
+
+
+def load_exclusions(dir):
+    """Set of excluded image paths under dir, empty without an exclusion list."""
+    path = exclusion_path(dir)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(os.path.join(dir, line.rstrip('\n')) for line in f if line.strip())
+
+
+def exclude_paths(dir, paths):
+    excluded = load_exclusions(dir)
+    if len(excluded) == 0:
+        return paths
+    kept = [p for p in paths if p not in excluded]
+    print('%s: excluding %d near-duplicate images' % (dir, len(paths) - len(kept)))
+    return kept
+
+
+def dedup_dir(dir, threshold, num_workers=None):
+    """Write the exclusion list of dir and return (# images, # clusters, # excluded)."""
+    hash_of = manifest_hashes(dir, phash, num_workers)
+    pixels = dict((record[0], record[3] * record[4]) for record in manifest_records(dir))
+    paths = sorted(p for p, h in hash_of.items() if h is not None)
+    hashes = np.array([int(hash_of[p], 16) for p in paths], dtype=np.uint64)
+
+    excluded = []
+    clusters = duplicate_clusters(hashes, threshold)
+    for cluster in clusters:
+        members = sorted((paths[i] for i in cluster), key=lambda p: (-pixels.get(p, 0), p))
+        excluded += members[1:]
+
+    tmp_path = exclusion_path(dir) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for path in sorted(excluded):
+            f.write(os.path.relpath(path, dir) + '\n')
+    os.replace(tmp_path, exclusion_path(dir))
+    return len(paths), len(clusters), len(excluded)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dataroot', type=str, required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--threshold', type=int, default=4, help='max # differing hash bits of near-duplicates')
+    parser.add_argument('--nThreads', type=int, default=os.cpu_count(), help='# hashing processes')
+    args = parser.parse_args()
+
+    for domain in ['A', 'B']:
+        dir = os.path.join(args.dataroot, args.phase + domain)
+        if os.path.isdir(dir):
+            num_images, num_clusters, num_excluded = dedup_dir(dir, args.threshold, args.nThreads)
+            print('%s: %d images, %d near-duplicate clusters, %d excluded -> %s' %
+                  (dir, num_images, num_clusters, num_excluded, exclusion_path(dir)))
@@ -0,0 +1,145 @@
+###############################################################################
+# Precomputed DexiNed edge maps of the real images.
+# DexiNed is frozen, so the edge map of a real image only depends on the
+# image. Every image of a domain folder is resized to loadSize like the
+# datasets do and run through DexiNed once (eval mode); the fused output is
+# stored as float16 (N x loadSize x loadSize) in <dir>_edges_<loadSize>.npy
+# with a .txt path index and a .json file recording the decode settings
+# (draft decoding or --no_draft, they must match training). With --edge_cache the unaligned dataset returns the
+# crop/flip of the edge map matching the image crop, and DLP_GAN only runs
+# DexiNed on the fake images.
+#
+# Usage:
+#   python -m data.edge_store --dataroot ./datasets/dlp_gan --phase train --loadSize 286 --model_dir ./weights
+#   (add --no_draft when training with --no_draft)
+###############################################################################
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from data.image_folder import make_dataset
+from data.image_store import decode_resized
+
+# DexiNed only takes sizes divisible by 16
+SIZE_MULTIPLE = 16
+
+
+def edge_store_paths(dir, load_size):
+    dir = dir.rstrip(os.sep)
+    base = '%s_edges_%d' % (dir, load_size)
+    return base + '.npy', base + '.txt'
+
+
+def edge_settings_path(dir, load_size):
+    return edge_store_paths(dir, load_size)[0][:-len('.npy')] + '.json'
+
+
+def load_dexined(model_dir, device):
+    # folded like in DLP_GAN, takes [-1, 1] images
+    from models.networks_.dexined import DexiNed, init_dexined
+    from models.transforms import fold_dexinet
+    net = DexiNed()
+    init_dexined(model_dir)
+    net.load_state_dict(torch.load(os.path.join(model_dir, 'dexined.weight'), map_location='cpu'))
+    net.to(device).eval()
+    for param in net.parameters():
+        param.requires_grad = False
+    return fold_dexinet(net)
+
+
+def edge_maps(net, images):
+    """Fused DexiNed output (N x 1 x H x W) for images in [-1, 1]. Images are
+    reflection padded to a multiple of 16 and the maps cropped back."""
+    h, w = images.shape[2:]
+    pad_h = -h % SIZE_MULTIPLE
+    pad_w = -w % SIZE_MULTIPLE
+    x = images
+    if pad_h or pad_w:
+        x = F.pad(x, (0, pad_w, 0, pad_h), mode='reflect')
+    return net(x)[-1][:, :, :h, :w]
+
+
+def extract_edges(dir, load_size, model_dir, batch_size=8, num_workers=4, device='cpu', draft=True):
+    paths = sorted(make_dataset(dir))
+    if len(paths) == 0:
+        raise RuntimeError('Found 0 images in: %s' % dir)
+    array_path, index_path = edge_store_paths(dir, load_size)
+    tmp_path = array_path + '.tmp.npy'
+    net = load_dexined(model_dir, device)
+
+    store = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16,
+                                      shape=(len(paths), load_size, load_size))
+    start_time = time.time()
+    with Pool(num_workers) as pool, torch.no_grad():
+        jobs = [(path, load_size, draft) for path in paths]
+        batch = []
+        for i, img in enumerate(pool.imap(decode_resized, jobs, chunksize=16)):
+            batch.append(img)
+            if len(batch) < batch_size and i + 1 < len(paths):
+                continue
+            images = torch.from_numpy(np.stack(batch)).permute(0, 3, 1, 2).float().to(device)
+            images = images.div_(127.5).sub_(1.0)
+            store[i + 1 - len(batch):i + 1] = edge_maps(net, images)[:, 0].cpu().numpy().astype(np.float16)
+            batch = []
+            if (i + 1) % 1000 < batch_size:
+                print('extracted %d / %d edge maps (%.1f img/s)' %
+                      (i + 1, len(paths), (i + 1) / (time.time() - start_time)))
+    store.flush()
+    del store
+
+    with open(index_path + '.tmp', 'w') as f:
+        f.write('\n'.join(paths) + '\n')
+    settings_path = edge_settings_path(dir, load_size)
+    with open(settings_path + '.tmp', 'w') as f:
+        json.dump({'draft': draft}, f)
+    os.replace(tmp_path, array_path)
+    os.replace(index_path + '.tmp', index_path)
+    os.replace(settings_path + '.tmp', settings_path)
+    print('stored %d edge maps of %s in %s' % (len(paths), dir, array_path))
+    return array_path
+
+
+def load_edge_store(dir, load_size, draft=True):
+    """({image path: row}, array path) of the edge maps of dir, which must
+    have been extracted with the same decoding (draft) as the training images."""
+    array_path, index_path = edge_store_paths(dir, load_size)
+    assert os.path.isfile(array_path), \
+        '%s not found, extract the edge maps first with: python -m data.edge_store' % array_path
+    settings_path = edge_settings_path(dir, load_size)
+    # stores without settings were extracted from draft decoded images
+    stored_draft = True
+    if os.path.isfile(settings_path):
+        with open(settings_path) as f:
+            stored_draft = json.load(f)['draft']
+    assert stored_draft == draft, \
+        'the edge maps in %s were extracted %s draft decoding, extract them again%s' % \
+        (array_path, 'with' if stored_draft else 'without', '' if draft else ' with --no_draft')
+    with open(index_path) as f:
+        paths = [line.rstrip('\n') for line in f if line.strip()]
+    return dict((path, i) for i, path in enumerate(paths)), array_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dataroot', type=str, required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--loadSize', type=int, default=286, help='scale images to this size')
+    parser.add_argument('--model_dir', type=str, default='./weights', help='the path to model directory')
+    parser.add_argument('--batchSize', type=int, default=8, help='# images per DexiNed call')
+    parser.add_argument('--nThreads', type=int, default=4, help='# processes used for decoding')
+    parser.add_argument('--gpu_ids', type=str, default='0', help='gpu id, -1 for CPU')
+    parser.add_argument('--no_draft', action='store_true', help='decode JPEGs at full resolution, as training with --no_draft does')
+    args = parser.parse_args()
+
+    gpu_id = int(args.gpu_ids.split(',')[0])
+    device = 'cuda:%d' % gpu_id if gpu_id >= 0 and torch.cuda.is_available() else 'cpu'
+    for domain in ['A', 'B']:
+        extract_edges(os.path.join(args.dataroot, args.phase + domain), args.loadSize, args.model_dir,
+                      args.batchSize, args.nThreads, device, not args.no_draft)
@@ -7,7 +7,6 @@
 
 import torch.utils.data as data
 
-from PIL import Image
 import os
 import os.path
 
@@ -21,10 +20,19 @@ def is_image_file(filename):
     return any(filename.endswith(extension) for extension in IMG_EXTENSIONS)
 
 
-def make_dataset(dir):
+def make_dataset(dir, use_manifest=True):
     images = []
+    # images inside a (nested) zip archive, see data/zip_folder.py
+    from data.zip_folder import is_zip_path, make_zip_dataset
+    if is_zip_path(dir):
+        return make_zip_dataset(dir)
     assert os.path.isdir(dir), '%s is not a valid directory' % dir
 
+    if use_manifest:
+        # cached listing, see data/manifest.py
+        from data.manifest import manifest_records
+        return [record[0] for record in manifest_records(dir)]
+
     for root, _, fnames in sorted(os.walk(dir)):
         for fname in fnames:
             if is_image_file(fname):
@@ -34,8 +42,30 @@ def make_dataset(dir):
     return images
 
 
-def default_loader(path):
-    return Image.open(path).convert('RGB')
+# draft_size: (w, h) the image is resized to afterwards. JPEGs are then decoded
+# by libjpeg at the smallest 1/2, 1/4 or 1/8 scale that is still >= draft_size.
+# The decoder backend is selected with --decoder, see data/decoders.py.
+def default_loader(path, draft_size=None):
+    from data.zip_folder import is_zip_path, zip_loader
+    from data.decoders import load_image
+    if is_zip_path(path):
+        return zip_loader(path, draft_size)
+    return load_image(path, draft_size)
+
+
+# encoded file contents, also of images inside zip archives
+def read_bytes(path):
+    from data.zip_folder import is_zip_path, zip_read
+    if is_zip_path(path):
+        return zip_read(path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def open_image(img, draft_size=None):
+    if draft_size is not None:
+        img.draft('RGB', draft_size)
+    return img.convert('RGB')
 
 
 class ImageFolder(data.Dataset):
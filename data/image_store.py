@@ -0,0 +1,89 @@
+###############################################################################
+# Pre-decoded image store.
+# Decodes every image of a domain folder once, resizes it to loadSize and
+# packs the pixels into a single uint8 .npy file (N x loadSize x loadSize x 3)
+# with a .txt path index next to it. The .npy file is opened memory-mapped,
+# so all DataLoader workers share the same page cache and never decode again.
+#
+# Usage:
+#   python -m data.image_store --dataroot ./datasets/lhq_1024 --phase train --loadSize 286
+###############################################################################
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from data.image_folder import make_dataset, default_loader
+
+
+def store_paths(dir, load_size):
+    dir = dir.rstrip(os.sep)
+    base = '%s_%d' % (dir, load_size)
+    return base + '.npy', base + '.txt'
+
+
+def decode_resized(args):
+    # args: (path, load_size) or (path, load_size, draft), draft decoding
+    # (see get_draft_size) unless draft is False
+    path, load_size = args[:2]
+    draft = args[2] if len(args) > 2 else True
+    img = default_loader(path, (load_size, load_size) if draft else None)
+    img = img.resize((load_size, load_size), Image.BICUBIC)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def pack_images(dir, load_size, num_workers=4):
+    paths = sorted(make_dataset(dir))
+    if len(paths) == 0:
+        raise RuntimeError('Found 0 images in: %s' % dir)
+    array_path, index_path = store_paths(dir, load_size)
+    tmp_path = array_path + '.tmp.npy'
+
+    store = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                      shape=(len(paths), load_size, load_size, 3))
+    start_time = time.time()
+    with Pool(num_workers) as pool:
+        jobs = [(path, load_size) for path in paths]
+        for i, img in enumerate(pool.imap(decode_resized, jobs, chunksize=16)):
+            store[i] = img
+            if (i + 1) % 1000 == 0:
+                print('packed %d / %d images (%.1f img/s)' %
+                      (i + 1, len(paths), (i + 1) / (time.time() - start_time)))
+    store.flush()
+    del store
+
+    with open(index_path + '.tmp', 'w') as f:
+        f.write('\n'.join(paths) + '\n')
+    os.replace(tmp_path, array_path)
+    os.replace(index_path + '.tmp', index_path)
+    print('packed %d images of %s into %s' % (len(paths), dir, array_path))
+    return array_path
+
+
+def load_store(dir, load_size):
+    array_path, index_path = store_paths(dir, load_size)
+    assert os.path.isfile(array_path), \
+        '%s not found, pack it first with: python -m data.image_store' % array_path
+    with open(index_path) as f:
+        paths = [line.rstrip('\n') for line in f if line.strip()]
+    return paths, array_path
+
+
+def open_store(array_path):
+    return np.load(array_path, mmap_mode='r')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dataroot', type=str, required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--loadSize', type=int, default=286, help='scale images to this size')
+    parser.add_argument('--nThreads', type=int, default=4, help='# processes used for decoding')
+    args = parser.parse_args()
+
+    for domain in ['A', 'B']:
+        pack_images(os.path.join(args.dataroot, args.phase + domain), args.loadSize, args.nThreads)
@@ -0,0 +1,109 @@
+###############################################################################
+# DataLoader auto-tuning.
+# Benchmarks worker count, prefetch_factor, persistent_workers and pin_memory
+# against the real dataset, one knob at a time starting from the current
+# options, and keeps the configuration with the highest samples/sec. The
+# choice is cached per machine and dataset settings in
+# ~/.cache/dlp_gan/loader_tune.json; delete the entry to tune again.
+###############################################################################
+
+import json
+import os
+import socket
+import time
+
+import torch
+import torch.utils.data
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'dlp_gan', 'loader_tune.json')
+
+
+def _cache_key(opt):
+    return '|'.join(str(v) for v in [socket.gethostname(), os.cpu_count(), os.path.abspath(opt.dataroot),
+                                     opt.phase, opt.dataset_mode, opt.batchSize, opt.loadSize, opt.fineSize,
+                                     opt.resize_or_crop, opt.batch_augment, opt.uint8_transport,
+                                     opt.bucket_batches, opt.decoder, opt.cache_A_mb, opt.num_crops])
+
+
+def _read_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        with open(CACHE_PATH + '.tmp', 'w') as f:
+            json.dump(cache, f, indent=1)
+        os.replace(CACHE_PATH + '.tmp', CACHE_PATH)
+    except (IOError, OSError) as e:
+        print('could not write loader tuning cache %s: %s' % (CACHE_PATH, e))
+
+
+def loader_kwargs(config):
+    # prefetch_factor and persistent_workers are only valid with worker processes
+    kwargs = {'num_workers': config['num_workers'], 'pin_memory': config['pin_memory']}
+    if config['num_workers'] > 0:
+        kwargs['prefetch_factor'] = config['prefetch_factor']
+        kwargs['persistent_workers'] = config['persistent_workers']
+    return kwargs
+
+
+def measure(dataset, data_kwargs, config, num_batches):
+    """samples/sec over two short passes, so worker startup and
+    persistent_workers are accounted for like at an epoch boundary."""
+    loader = torch.utils.data.DataLoader(dataset, **dict(data_kwargs, **loader_kwargs(config)))
+    samples = 0
+    start_time = time.time()
+    for _ in range(2):
+        for i, data in enumerate(loader):
+            samples += data['A'].size(0)
+            if i + 1 >= num_batches:
+                break
+    samples_per_sec = samples / (time.time() - start_time)
+    del loader
+    return samples_per_sec
+
+
+def tune_loader(dataset, opt, data_kwargs, num_batches=20):
+    """Return DataLoader keyword arguments for the fastest configuration found.
+    data_kwargs: the batch_size/shuffle/sampler arguments the loader will use."""
+    cache = _read_cache()
+    key = _cache_key(opt)
+    if key in cache:
+        config = cache[key]
+        print('using tuned DataLoader settings %s (%.1f samples/sec)' %
+              (loader_kwargs(config), config['samples_per_sec']))
+        return loader_kwargs(config)
+
+    cpus = os.cpu_count() or 1
+    workers = sorted(set([0, int(opt.nThreads), cpus] + [2 ** i for i in range(8) if 2 ** i <= cpus]))
+    search = [('num_workers', workers),
+              ('prefetch_factor', [2, 4, 8]),
+              ('persistent_workers', [False, True]),
+              ('pin_memory', [False, True] if torch.cuda.is_available() else [False])]
+
+    best = {'num_workers': int(opt.nThreads), 'prefetch_factor': 2,
+            'persistent_workers': False, 'pin_memory': False}
+    best_speed = None
+    print('tuning DataLoader settings on %d batches x 2 passes per trial...' % num_batches)
+    for name, values in search:
+        if name in ['prefetch_factor', 'persistent_workers'] and best['num_workers'] == 0:
+            continue
+        for value in values:
+            config = dict(best, **{name: value})
+            if best_speed is not None and config == best:
+                continue
+            speed = measure(dataset, data_kwargs, config, num_batches)
+            print('  %s: %.1f samples/sec' % (loader_kwargs(config), speed))
+            if best_speed is None or speed > best_speed:
+                best, best_speed = config, speed
+
+    best['samples_per_sec'] = best_speed
+    cache[key] = best
+    _write_cache(cache)
+    print('selected DataLoader settings %s (%.1f samples/sec)' % (loader_kwargs(best), best_speed))
+    return loader_kwargs(best)
@@ -0,0 +1,160 @@
+###############################################################################
+# Persistent dataset manifest.
+# make_dataset used to os.walk the whole tree on every start, which is slow on
+# network mounts. The manifest caches, per directory, its mtime, its
+# subdirectories and its image files (size, mtime, width, height and, once
+# computed by data/dedup.py, a perceptual hash) in
+# <dir>.manifest.json, next to the directory (writing it inside would change
+# the directory mtime on every save). On refresh only one stat() per known directory is
+# needed; directories whose mtime changed are rescanned, and image headers are
+# only read for new or modified files.
+#
+# Files modified in place (which does not touch the directory mtime) are not
+# detected; delete the manifest file to force a full rescan.
+###############################################################################
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+from PIL import Image
+
+from data.image_folder import is_image_file
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+
+
+def _image_size(path):
+    try:
+        with Image.open(path) as img:
+            return list(img.size)
+    except (IOError, OSError):
+        return [0, 0]
+
+
+def _scan_dir(full_dir, cached):
+    cached_files = cached['files'] if cached is not None else {}
+    subdirs = []
+    files = {}
+    for entry in os.scandir(full_dir):
+        # symlinked folders are not followed, like os.walk in make_dataset
+        if entry.is_dir(follow_symlinks=False):
+            subdirs.append(entry.name)
+        elif is_image_file(entry.name):
+            st = entry.stat()
+            record = cached_files.get(entry.name)
+            if record is not None and record[0] == st.st_size and record[1] == st.st_mtime_ns:
+                files[entry.name] = record
+            else:
+                # width and height are filled in by _fill_sizes
+                files[entry.name] = [st.st_size, st.st_mtime_ns, None, None]
+    return {'mtime': os.stat(full_dir).st_mtime_ns,
+            'subdirs': sorted(subdirs),
+            'files': files}
+
+
+def _fill_sizes(root, dirs, num_threads=16):
+    todo = []
+    for rel, entry in dirs.items():
+        for fname, record in entry['files'].items():
+            if record[2] is None:
+                todo.append((os.path.join(root, rel, fname), record))
+    if len(todo) == 0:
+        return
+    with ThreadPoolExecutor(num_threads) as pool:
+        for (path, record), size in zip(todo, pool.map(_image_size, [p for p, _ in todo])):
+            record[2], record[3] = size
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest['dirs']
+
+
+def _write_manifest(path, dirs):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'dirs': dirs}, f)
+        os.replace(tmp_path, path)
+    except (IOError, OSError) as e:
+        print('could not write manifest %s: %s' % (path, e))
+
+
+def manifest_path(dir):
+    return os.path.normpath(dir) + MANIFEST_SUFFIX
+
+
+def load_manifest(dir):
+    """Return {relative dir: entry} for dir, refreshing the cached manifest."""
+    manifest_file = manifest_path(dir)
+    old_dirs = _read_manifest(manifest_file)
+
+    dirs = {}
+    changed = False
+    stack = ['']
+    while stack:
+        rel = stack.pop()
+        full_dir = os.path.join(dir, rel)
+        try:
+            mtime = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            changed = True
+            continue
+        cached = old_dirs.get(rel)
+        if cached is not None and cached['mtime'] == mtime:
+            entry = cached
+        else:
+            entry = _scan_dir(full_dir, cached)
+            changed = True
+        dirs[rel] = entry
+        stack.extend(os.path.join(rel, d) for d in entry['subdirs'])
+
+    if changed or len(dirs) != len(old_dirs):
+        _fill_sizes(dir, dirs)
+        _write_manifest(manifest_file, dirs)
+    return dirs
+
+
+def manifest_records(dir):
+    """Return sorted (path, file size, mtime_ns, width, height) records of all images under dir."""
+    records = []
+    for rel, entry in sorted(load_manifest(dir).items()):
+        for fname, record in sorted(entry['files'].items()):
+            size, mtime, width, height = record[:4]
+            records.append((os.path.join(dir, rel, fname), size, mtime, width, height))
+    return records
+
+
+def image_sizes(dir):
+    """Return {path: (width, height)} for all images under dir, from the
+    manifest or, inside zip archives, from the image headers."""
+    from data.zip_folder import is_zip_path, make_zip_dataset, zip_image_size
+    if is_zip_path(dir):
+        return dict((path, zip_image_size(path)) for path in make_zip_dataset(dir))
+    return dict((record[0], (record[3], record[4])) for record in manifest_records(dir))
+
+
+def manifest_hashes(dir, hash_fn, num_workers=None):
+    """Return {path: hash} for all images under dir. Hashes missing from the
+    manifest (new or modified files) are computed with hash_fn(path) in a
+    process pool and saved to the manifest."""
+    dirs = load_manifest(dir)
+    todo = [(rel, fname) for rel, entry in sorted(dirs.items())
+            for fname, record in sorted(entry['files'].items()) if len(record) < 5]
+    if len(todo) > 0:
+        paths = [os.path.join(dir, rel, fname) for rel, fname in todo]
+        with Pool(num_workers) as pool:
+            for (rel, fname), h in zip(todo, pool.imap(hash_fn, paths, chunksize=64)):
+                dirs[rel]['files'][fname].append(h)
+        _write_manifest(manifest_path(dir), dirs)
+    return dict((os.path.join(dir, rel, fname), record[4])
+                for rel, entry in dirs.items() for fname, record in entry['files'].items())
@@ -0,0 +1,79 @@
+###############################################################################
+# Several crops per decoded image.
+# With --num_crops k every A and B image of the unaligned dataset is decoded
+# and resized to loadSize once, and k independent random crops/flips are cut
+# from it. The crops of each domain go through a small per-worker shuffle
+# buffer (--crop_buffer crops), so the crops of one image end up in different
+# batches, and A crops are paired with random B crops from the B buffer.
+# One epoch is one pass over the images, i.e. k times as many samples.
+###############################################################################
+
+import torch.utils.data as data
+
+from data.base_dataset import array_transform, rgb_to_gray
+from data.samplers import UnalignedSampler
+from data.shard_dataset import shuffle_buffer
+
+
+class MultiCropDataset(data.IterableDataset):
+    def name(self):
+        return 'MultiCropDataset'
+
+    def initialize(self, opt, dataset):
+        assert(opt.resize_or_crop == 'resize_and_crop')
+        assert(opt.dataset_mode == 'unaligned' and not opt.bucket_batches and not opt.edge_cache)
+        self.opt = opt
+        self.dataset = dataset
+        self.num_crops = opt.num_crops
+        self.dir_A = dataset.dir_A
+        self.dir_B = dataset.dir_B
+        self.A_size = dataset.A_size
+        self.B_size = dataset.B_size
+        # splits the images between processes like --unaligned_sampler,
+        # and between the workers of a process below
+        self.sampler = UnalignedSampler(self.A_size, self.B_size, opt.max_dataset_size,
+                                        shuffle=not opt.serial_batches)
+
+    def set_epoch(self, epoch):
+        self.sampler.set_epoch(epoch)
+
+    def crops(self, images):
+        for path, load in images:
+            arr = load()
+            for _ in range(self.num_crops):
+                yield path, array_transform(arr, self.opt)
+
+    def __iter__(self):
+        worker_info = data.get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+        pairs = list(self.sampler)[worker_id::num_workers]
+        # persistent workers are not told the epoch, reshuffle on the next pass
+        self.sampler.set_epoch(self.sampler.epoch + 1)
+
+        A_paths, B_paths = self.dataset.A_paths, self.dataset.B_paths
+        A_images = ((A_paths[i], lambda i=i: self.dataset.resized_A(i)) for i, _ in pairs)
+        B_images = ((B_paths[i], lambda i=i: self.dataset.load_resized(B_paths[i])) for _, i in pairs)
+        A_stream = shuffle_buffer(self.crops(A_images), self.opt.crop_buffer)
+        B_stream = shuffle_buffer(self.crops(B_images), self.opt.crop_buffer)
+
+        if self.opt.which_direction == 'BtoA':
+            input_nc = self.opt.output_nc
+            output_nc = self.opt.input_nc
+        else:
+            input_nc = self.opt.input_nc
+            output_nc = self.opt.output_nc
+
+        for (A_path, A), (B_path, B) in zip(A_stream, B_stream):
+            if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+                A = rgb_to_gray(A)
+
+            if output_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+                B = rgb_to_gray(B)
+            yield {'A': A, 'B': B,
+                   'A_paths': A_path, 'B_paths': B_path}
+
+    def __len__(self):
+        return len(self.sampler) * self.num_crops
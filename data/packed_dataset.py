@@ -0,0 +1,58 @@
+import os.path
+import random
+from data.base_dataset import BaseDataset, array_transform, rgb_to_gray
+from data.image_store import load_store, open_store
+
+
+class PackedDataset(BaseDataset):
+    def initialize(self, opt):
+        self.opt = opt
+        self.root = opt.dataroot
+        self.dir_A = os.path.join(opt.dataroot, opt.phase + 'A')
+        self.dir_B = os.path.join(opt.dataroot, opt.phase + 'B')
+
+        assert(opt.resize_or_crop == 'resize_and_crop')
+
+        self.A_paths, self.A_store_path = load_store(self.dir_A, opt.loadSize)
+        self.B_paths, self.B_store_path = load_store(self.dir_B, opt.loadSize)
+        self.A_size = len(self.A_paths)
+        self.B_size = len(self.B_paths)
+        # opened lazily so that every worker maps the file itself
+        self.A_store = None
+        self.B_store = None
+
+    def __getitem__(self, index):
+        if self.A_store is None:
+            self.A_store = open_store(self.A_store_path)
+            self.B_store = open_store(self.B_store_path)
+
+        if isinstance(index, (tuple, list)):  # (index_A, index_B) from UnalignedSampler
+            index_A, index_B = index
+        else:
+            index_A = index % self.A_size
+            index_B = random.randint(0, self.B_size - 1)
+        A_path = self.A_paths[index_A]
+        B_path = self.B_paths[index_B]
+
+        A = array_transform(self.A_store[index_A], self.opt)
+        B = array_transform(self.B_store[index_B], self.opt)
+        if self.opt.which_direction == 'BtoA':
+            input_nc = self.opt.output_nc
+            output_nc = self.opt.input_nc
+        else:
+            input_nc = self.opt.input_nc
+            output_nc = self.opt.output_nc
+
+        if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+            A = rgb_to_gray(A)
+
+        if output_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+            B = rgb_to_gray(B)
+        return {'A': A, 'B': B,
+                'A_paths': A_path, 'B_paths': B_path}
+
+    def __len__(self):
+        return max(self.A_size, self.B_size)
+
+    def name(self):
+        return 'PackedDataset'
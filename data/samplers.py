@@ -0,0 +1,166 @@
+import math
+import os
+from collections import namedtuple
+
+import torch
+import torch.distributed as dist
+from torch.utils.data import Sampler
+
+# dataset index together with the (width, height) its image is fitted to
+BucketIndex = namedtuple('BucketIndex', ['index', 'size'])
+
+
+def get_world():
+    """(num_replicas, rank) of this training process."""
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_world_size(), dist.get_rank()
+    return int(os.environ.get('WORLD_SIZE', 1)), int(os.environ.get('RANK', 0))
+
+
+class UnalignedSampler(Sampler):
+    """Yields (index_A, index_B) pairs for UnalignedDataset-style datasets.
+
+    The A index space, max(A_size, B_size) long like UnalignedDataset, is
+    shuffled with a generator shared by all ranks and split between them, so
+    N processes see disjoint samples. B partners come from this rank's own
+    share of a shared B permutation, drawn in random order by a per-rank
+    generator. max_dataset_size truncates the A and B index spaces.
+    Call set_epoch at the start of every epoch to reshuffle.
+    """
+
+    def __init__(self, A_size, B_size, max_dataset_size=float('inf'), shuffle=True, seed=0,
+                 num_replicas=None, rank=None):
+        if num_replicas is None or rank is None:
+            num_replicas, rank = get_world()
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.A_size = int(min(A_size, max_dataset_size))
+        self.B_size = int(min(B_size, max_dataset_size))
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.total_size = max(self.A_size, self.B_size)
+        self.num_samples = int(math.ceil(self.total_size / float(self.num_replicas)))
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        g = torch.Generator()
+        g.manual_seed(self.seed + self.epoch)
+        if self.shuffle:
+            indices = torch.randperm(self.total_size, generator=g)
+        else:
+            indices = torch.arange(self.total_size)
+        # pad so every rank gets the same number of samples
+        padded = self.num_samples * self.num_replicas
+        indices = torch.cat([indices, indices[:padded - self.total_size]])
+        A_indices = indices[self.rank:padded:self.num_replicas] % self.A_size
+
+        B_share = torch.randperm(self.B_size, generator=g)[self.rank::self.num_replicas]
+        if len(B_share) == 0:
+            B_share = torch.arange(self.B_size)
+        g_rank = torch.Generator()
+        g_rank.manual_seed((self.seed + self.epoch) * 1000003 + self.rank)
+        B_indices = []
+        while len(B_indices) < self.num_samples:
+            B_indices += B_share[torch.randperm(len(B_share), generator=g_rank)].tolist()
+
+        return iter(zip(A_indices.tolist(), B_indices[:self.num_samples]))
+
+    def __len__(self):
+        return self.num_samples
+
+
+def bucket_size(width, height, target_width, step, pad_only=False):
+    """Canonical (width, height) of an image of the given size once scaled to
+    target_width: the height is rounded to a multiple of step, up when
+    pad_only is set so that nothing gets cropped."""
+    scaled_height = target_width * height / float(width)
+    if pad_only:
+        bucket_height = int(math.ceil(scaled_height / step)) * step
+    else:
+        bucket_height = int(round(scaled_height / step)) * step
+    return (target_width, max(bucket_height, step))
+
+
+class BucketBatchSampler(Sampler):
+    """Batches of BucketIndex, each batch holding images of one canonical size.
+
+    sizes: canonical (width, height) of every dataset index, see bucket_size.
+    Images are shuffled within their bucket and the batches are shuffled
+    between buckets; the last batch of a bucket may be smaller.
+    """
+
+    def __init__(self, sizes, batch_size, shuffle=True, drop_last=False, seed=0):
+        self.buckets = {}
+        for index, size in enumerate(sizes):
+            self.buckets.setdefault(size, []).append(index)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        g = torch.Generator()
+        g.manual_seed(self.seed + self.epoch)
+        batches = []
+        for size in sorted(self.buckets):
+            indices = self.buckets[size]
+            if self.shuffle:
+                indices = [indices[i] for i in torch.randperm(len(indices), generator=g).tolist()]
+            for i in range(0, len(indices), self.batch_size):
+                batch = indices[i:i + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append([BucketIndex(index, size) for index in batch])
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=g).tolist()]
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return sum(len(indices) // self.batch_size for indices in self.buckets.values())
+        return sum((len(indices) + self.batch_size - 1) // self.batch_size for indices in self.buckets.values())
+
+
+class InfiniteSampler(Sampler):
+    """Repeats sampler, or a shuffled range(size) without one, forever.
+
+    Every pass gets its own epoch number (starting at start_epoch) and is
+    reshuffled, so one DataLoader iterator - and one set of worker
+    processes - lasts the whole run.
+    """
+
+    def __init__(self, sampler=None, size=None, shuffle=True, seed=0, start_epoch=0):
+        assert(sampler is not None or size is not None)
+        self.sampler = sampler
+        self.size = size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.start_epoch = start_epoch
+
+    def set_epoch(self, epoch):
+        self.start_epoch = epoch
+
+    def __iter__(self):
+        epoch = self.start_epoch
+        while True:
+            if self.sampler is not None:
+                self.sampler.set_epoch(epoch)
+                for item in self.sampler:
+                    yield item
+            else:
+                g = torch.Generator()
+                g.manual_seed(self.seed + epoch)
+                if self.shuffle:
+                    indices = torch.randperm(self.size, generator=g)
+                else:
+                    indices = torch.arange(self.size)
+                for index in indices.tolist():
+                    yield index
+            epoch += 1
@@ -0,0 +1,186 @@
+###############################################################################
+# Sharded tar streaming dataset.
+# trainA/trainB are converted once into sequential tar shards
+# (<dir>_shards/shard-000000.tar, ...) holding the encoded image files, so
+# training reads a few large files front to back instead of hundreds of
+# thousands of small ones. Shards are split across DataLoader workers and
+# samples go through a bounded shuffle buffer; pairing A with a random B from
+# the B shuffle buffer reproduces the unaligned pairing of UnalignedDataset.
+#
+# Usage:
+#   python -m data.shard_dataset --dataroot ./datasets/lhq_1024 --phase train --shard_size 1000
+###############################################################################
+
+import argparse
+import json
+import os
+import random
+import tarfile
+
+import torch.utils.data as data
+
+from data.base_dataset import get_transform, get_draft_size, rgb_to_gray
+from data.image_folder import make_dataset
+from data.decoders import decode_image
+
+SHARD_INDEX = 'index.json'
+
+
+def shard_dir(dir):
+    return os.path.normpath(dir) + '_shards'
+
+
+def write_shards(dir, shard_size=1000, seed=0):
+    paths = sorted(make_dataset(dir))
+    if len(paths) == 0:
+        raise RuntimeError('Found 0 images in: %s' % dir)
+    # mix the images across shards so shard order shuffling is enough at read time
+    random.Random(seed).shuffle(paths)
+
+    out_dir = shard_dir(dir)
+    os.makedirs(out_dir, exist_ok=True)
+    shards = []
+    for start in range(0, len(paths), shard_size):
+        shard_name = 'shard-%06d.tar' % len(shards)
+        tmp_path = os.path.join(out_dir, shard_name + '.tmp')
+        with tarfile.open(tmp_path, 'w') as tar:
+            for path in paths[start:start + shard_size]:
+                tar.add(path, arcname=os.path.relpath(path, dir))
+        os.replace(tmp_path, os.path.join(out_dir, shard_name))
+        shards.append(shard_name)
+        print('wrote %s (%d / %d images)' % (shard_name, min(start + shard_size, len(paths)), len(paths)))
+
+    with open(os.path.join(out_dir, SHARD_INDEX), 'w') as f:
+        json.dump({'num_samples': len(paths), 'shards': shards}, f)
+    return out_dir
+
+
+def load_shard_index(dir):
+    index_path = os.path.join(shard_dir(dir), SHARD_INDEX)
+    assert os.path.isfile(index_path), \
+        '%s not found, write the shards first with: python -m data.shard_dataset' % index_path
+    with open(index_path) as f:
+        index = json.load(f)
+    shards = [os.path.join(shard_dir(dir), name) for name in index['shards']]
+    return shards, index['num_samples']
+
+
+def split_shards(shards, worker_id, num_workers):
+    # returns (shards, stride, offset): with fewer shards than workers every
+    # worker reads all shards and keeps every num_workers-th sample
+    if len(shards) >= num_workers:
+        return shards[worker_id::num_workers], 1, 0
+    return shards, num_workers, worker_id
+
+
+def iter_shards(shards, stride=1, offset=0, num_samples=None):
+    # endless stream of (path, encoded bytes), shard order reshuffled every pass.
+    # num_samples: samples in all of shards, to fail early instead of never
+    # yielding anything
+    if len(shards) == 0 or num_samples == 0:
+        raise RuntimeError('no samples in the shards')
+    if num_samples is not None and num_samples < stride:
+        raise RuntimeError('%d samples in the shards, fewer than the %d workers reading them, use fewer nThreads'
+                           % (num_samples, stride))
+    while True:
+        shards = list(shards)
+        random.shuffle(shards)
+        i = 0
+        for shard in shards:
+            with tarfile.open(shard, 'r|') as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    if i % stride == offset:
+                        yield os.path.join(shard, member.name), tar.extractfile(member).read()
+                    i += 1
+        if i <= offset:
+            # empty shard files
+            raise RuntimeError('no samples for this worker in %s' % ', '.join(shards))
+
+
+def shuffle_buffer(samples, buffer_size):
+    buffer = []
+    for sample in samples:
+        if len(buffer) < buffer_size:
+            buffer.append(sample)
+            continue
+        i = random.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = sample
+    # the rest once a finite stream runs out
+    random.shuffle(buffer)
+    for sample in buffer:
+        yield sample
+
+
+class ShardDataset(data.IterableDataset):
+    def name(self):
+        return 'ShardDataset'
+
+    def initialize(self, opt):
+        self.opt = opt
+        self.root = opt.dataroot
+        self.dir_A = os.path.join(opt.dataroot, opt.phase + 'A')
+        self.dir_B = os.path.join(opt.dataroot, opt.phase + 'B')
+
+        self.A_shards, self.A_size = load_shard_index(self.dir_A)
+        self.B_shards, self.B_size = load_shard_index(self.dir_B)
+        self.transform = get_transform(opt)
+        self.draft_size = get_draft_size(opt)
+
+    def load(self, sample):
+        path, raw = sample
+        img = decode_image(raw, path, self.draft_size)
+        return path, self.transform(img)
+
+    def __iter__(self):
+        worker_info = data.get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+        # number of samples this worker yields in one epoch
+        count = len(self) // num_workers + (1 if worker_id < len(self) % num_workers else 0)
+
+        buffer_size = self.opt.shuffle_buffer
+        A_shards, A_stride, A_offset = split_shards(self.A_shards, worker_id, num_workers)
+        B_shards, B_stride, B_offset = split_shards(self.B_shards, worker_id, num_workers)
+        # with a stride, every worker reads all the shards
+        A_stream = shuffle_buffer(iter_shards(A_shards, A_stride, A_offset,
+                                              self.A_size if A_stride > 1 else None), buffer_size)
+        B_stream = shuffle_buffer(iter_shards(B_shards, B_stride, B_offset,
+                                              self.B_size if B_stride > 1 else None), buffer_size)
+
+        if self.opt.which_direction == 'BtoA':
+            input_nc = self.opt.output_nc
+            output_nc = self.opt.input_nc
+        else:
+            input_nc = self.opt.input_nc
+            output_nc = self.opt.output_nc
+
+        for _ in range(count):
+            A_path, A = self.load(next(A_stream))
+            B_path, B = self.load(next(B_stream))
+
+            if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+                A = rgb_to_gray(A)
+
+            if output_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+                B = rgb_to_gray(B)
+            yield {'A': A, 'B': B,
+                   'A_paths': A_path, 'B_paths': B_path}
+
+    def __len__(self):
+        return max(self.A_size, self.B_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dataroot', type=str, required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--shard_size', type=int, default=1000, help='# images per tar shard')
+    args = parser.parse_args()
+
+    for domain in ['A', 'B']:
+        write_shards(os.path.join(args.dataroot, args.phase + domain), args.shard_size)
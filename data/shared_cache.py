@@ -0,0 +1,33 @@
+###############################################################################
+# Shared-memory cache of decoded images.
+# A uint8 N x H x W x 3 tensor in shared memory, allocated by the main process
+# and shared with every DataLoader worker (also across the per-epoch worker
+# restarts). Workers fill a slot the first time its image is loaded; after the
+# first epoch the cached images are neither read from disk nor decoded again.
+# Only the first max_bytes worth of images are cached, the rest keep being
+# loaded from disk.
+###############################################################################
+
+import torch
+
+
+class SharedImageCache():
+    def __init__(self, num_images, height, width, max_bytes):
+        image_bytes = height * width * 3
+        self.capacity = int(min(num_images, max_bytes // image_bytes))
+        self.images = torch.zeros((self.capacity, height, width, 3), dtype=torch.uint8).share_memory_()
+        self.filled = torch.zeros(self.capacity, dtype=torch.uint8).share_memory_()
+
+    def nbytes(self):
+        return self.images.nelement()
+
+    def get(self, index, load):
+        """H x W x 3 uint8 array of image index, calling load() and storing the
+        result on the first access; None if index is beyond the capacity."""
+        if index >= self.capacity:
+            return None
+        image = self.images[index].numpy()
+        if not self.filled[index]:
+            image[...] = load()
+            self.filled[index] = 1
+        return image
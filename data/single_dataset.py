@@ -1,7 +1,8 @@
 import os.path
 import torchvision.transforms as transforms
-from data.base_dataset import BaseDataset, get_transform
-from data.image_folder import make_dataset
+from data.base_dataset import BaseDataset, get_transform, get_draft_size, rgb_to_gray, fit_to_size
+from data.samplers import BucketIndex
+from data.image_folder import make_dataset, default_loader
 from PIL import Image
 
 
@@ -16,19 +17,24 @@ class SingleDataset(BaseDataset):
         self.A_paths = sorted(self.A_paths)
 
         self.transform = get_transform(opt)
+        self.draft_size = get_draft_size(opt)
 
     def __getitem__(self, index):
+        size = None
+        if isinstance(index, BucketIndex):  # from BucketBatchSampler
+            index, size = index
         A_path = self.A_paths[index]
-        A_img = Image.open(A_path).convert('RGB')
+        A_img = default_loader(A_path, self.draft_size)
+        if size is not None:
+            A_img = fit_to_size(A_img, size, self.opt)
         A = self.transform(A_img)
         if self.opt.which_direction == 'BtoA':
             input_nc = self.opt.output_nc
         else:
             input_nc = self.opt.input_nc
 
-        if input_nc == 1:  # RGB to gray
-            tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-            A = tmp.unsqueeze(0)
+        if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+            A = rgb_to_gray(A)
 
         return {'A': A, 'A_paths': A_path}
 
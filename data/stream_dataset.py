@@ -0,0 +1,114 @@
+###############################################################################
+# Streaming inference dataset.
+# Yields images as they show up instead of listing dataroot once:
+#   watch : poll dataroot (not recursively) for new image files; a file is only
+#           picked up once its size and mtime stay the same for one poll, so
+#           half-copied files are not read
+#   stdin : image paths, one per line, on standard input
+#   queue : image paths, one per line, written to the named pipe --stream_queue
+# Images whose output (see output_path) already exists are skipped. The
+# dataset runs in the main process (nThreads 0): DataLoader takes batches from
+# its workers in turn, so one idle worker would hold back images another
+# worker already loaded.
+###############################################################################
+
+import hashlib
+import os
+import sys
+import time
+
+import torch.utils.data as data
+
+from data.base_dataset import get_transform, get_draft_size, rgb_to_gray
+from data.image_folder import is_image_file, default_loader
+
+
+def output_path(opt, path):
+    # keyed on the path relative to dataroot (subfolders are kept), so images
+    # with the same name in different folders get different results; images
+    # outside dataroot get a short hash of their absolute path
+    path = os.path.abspath(path)
+    name = os.path.splitext(os.path.relpath(path, os.path.abspath(opt.dataroot)))[0]
+    if name.split(os.sep)[0] == os.pardir:
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]
+        name = '%s_%s' % (os.path.splitext(os.path.basename(path))[0], digest)
+    return os.path.join(opt.results_dir, '%s_fake_B.png' % name)
+
+
+def watch_folder(dir, interval):
+    seen = set()
+    pending = {}
+    while True:
+        current = {}
+        for entry in os.scandir(dir):
+            if entry.is_file() and is_image_file(entry.name) and entry.path not in seen:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # deleted or renamed since the listing
+                    continue
+                current[entry.path] = (st.st_size, st.st_mtime_ns)
+        for path in sorted(current):
+            if pending.get(path) == current[path]:
+                seen.add(path)
+                yield path
+        pending = current
+        time.sleep(interval)
+
+
+def read_lines(f):
+    for line in f:
+        path = line.strip()
+        if path:
+            yield path
+
+
+def read_queue(queue_path):
+    if not os.path.exists(queue_path):
+        os.mkfifo(queue_path)
+    # the pipe reaches EOF whenever the last writer closes it, so reopen it
+    while True:
+        with open(queue_path) as f:
+            for path in read_lines(f):
+                yield path
+
+
+class StreamDataset(data.IterableDataset):
+    def name(self):
+        return 'StreamDataset'
+
+    def initialize(self, opt):
+        self.opt = opt
+        self.root = opt.dataroot
+        self.transform = get_transform(opt)
+        self.draft_size = get_draft_size(opt)
+
+    def paths(self):
+        if self.opt.stream_source == 'stdin':
+            return read_lines(sys.stdin)
+        if self.opt.stream_source == 'queue':
+            return read_queue(self.opt.stream_queue)
+        return watch_folder(self.root, self.opt.poll_interval)
+
+    def __iter__(self):
+        assert data.get_worker_info() is None, 'the stream dataset mode needs nThreads 0'
+
+        if self.opt.which_direction == 'BtoA':
+            input_nc = self.opt.output_nc
+        else:
+            input_nc = self.opt.input_nc
+
+        for A_path in self.paths():
+            if os.path.exists(output_path(self.opt, A_path)):
+                continue
+            try:
+                A_img = default_loader(A_path, self.draft_size)
+            except (IOError, OSError) as e:
+                print('skipping %s: %s' % (A_path, e))
+                continue
+            A = self.transform(A_img)
+
+            if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+                A = rgb_to_gray(A)
+
+            yield {'A': A, 'A_paths': A_path}
@@ -1,10 +1,17 @@
 import os.path
 import torchvision.transforms as transforms
-from data.base_dataset import BaseDataset, get_transform
-from data.image_folder import make_dataset
+from data.base_dataset import BaseDataset, get_transform, get_draft_size, rgb_to_gray, fit_to_size, array_transform
+from data.base_dataset import crop_flip_arrays, array_to_tensor, array_to_uint8_tensor
+from data.edge_store import load_edge_store
+from data.shared_cache import SharedImageCache
+from data.samplers import BucketIndex
+from data.dedup import exclude_paths
+from data.image_folder import make_dataset, default_loader
 from PIL import Image
 import PIL
 import random
+import numpy as np
+import torch
 
 class UnalignedDataset(BaseDataset):
     def initialize(self, opt):
@@ -18,21 +25,90 @@ class UnalignedDataset(BaseDataset):
 
         self.A_paths = sorted(self.A_paths)
         self.B_paths = sorted(self.B_paths)
+        if not opt.no_exclude:
+            # near-duplicates listed by data/dedup.py
+            self.A_paths = exclude_paths(self.dir_A, self.A_paths)
+            self.B_paths = exclude_paths(self.dir_B, self.B_paths)
         self.A_size = len(self.A_paths)
         self.B_size = len(self.B_paths)
         self.transform = get_transform(opt)
+        self.draft_size = get_draft_size(opt)
+
+        self.A_cache = None
+        if opt.cache_A_mb > 0:
+            # decoded and resized A images, shared by all loader workers
+            assert(opt.resize_or_crop == 'resize_and_crop')
+            self.A_cache = SharedImageCache(self.A_size, opt.loadSize, opt.loadSize, opt.cache_A_mb * 1024 * 1024)
+            print('caching %d / %d images of %s in shared memory (%.1f MB)' %
+                  (self.A_cache.capacity, self.A_size, self.dir_A, self.A_cache.nbytes() / 1048576.0))
+
+        if opt.edge_cache:
+            # DexiNed edge maps of the real images, see data/edge_store.py
+            assert(opt.resize_or_crop == 'resize_and_crop' and not opt.batch_augment)
+            self.A_edge_rows, self.A_edge_path = load_edge_store(self.dir_A, opt.loadSize, not opt.no_draft)
+            self.B_edge_rows, self.B_edge_path = load_edge_store(self.dir_B, opt.loadSize, not opt.no_draft)
+            for paths, rows, dir in [(self.A_paths, self.A_edge_rows, self.dir_A),
+                                     (self.B_paths, self.B_edge_rows, self.dir_B)]:
+                missing = len([path for path in paths if path not in rows])
+                assert missing == 0, '%d images of %s have no edge map, extract them again' % (missing, dir)
+            # opened lazily so that every worker maps the file itself
+            self.A_edges = None
+            self.B_edges = None
+
+    def load_resized(self, path):
+        img = default_loader(path, self.draft_size)
+        return np.asarray(img.resize((self.opt.loadSize, self.opt.loadSize), Image.BICUBIC))
+
+    def resized_A(self, index_A):
+        # from the shared cache when it holds the image
+        if self.A_cache is not None:
+            A_arr = self.A_cache.get(index_A, lambda: self.load_resized(self.A_paths[index_A]))
+            if A_arr is not None:
+                return A_arr
+        return self.load_resized(self.A_paths[index_A])
+
+    def crop_with_edges(self, arr, edges):
+        arr, edges = crop_flip_arrays([arr, edges], self.opt)
+        if self.opt.uint8_transport:
+            img = array_to_uint8_tensor(arr)
+        else:
+            img = array_to_tensor(arr)
+        return img, torch.from_numpy(np.ascontiguousarray(edges))[None]
 
     def __getitem__(self, index):
-        A_path = self.A_paths[index % self.A_size]
-        index_A = index % self.A_size
-        index_B = random.randint(0, self.B_size - 1)
+        size = None
+        if isinstance(index, BucketIndex):  # from BucketBatchSampler
+            index, size = index
+        if isinstance(index, (tuple, list)):  # (index_A, index_B) from UnalignedSampler
+            index_A, index_B = index
+        else:
+            index_A = index % self.A_size
+            index_B = random.randint(0, self.B_size - 1)
+        A_path = self.A_paths[index_A]
         B_path = self.B_paths[index_B]
         # print('(A, B) = (%d, %d)' % (index_A, index_B))
-        A_img = Image.open(A_path).convert('RGB')
-        B_img = Image.open(B_path).convert('RGB')
+        if self.opt.edge_cache:
+            if self.A_edges is None:
+                self.A_edges = np.load(self.A_edge_path, mmap_mode='r')
+                self.B_edges = np.load(self.B_edge_path, mmap_mode='r')
+            A, A_edges = self.crop_with_edges(self.resized_A(index_A), self.A_edges[self.A_edge_rows[A_path]])
+            B, B_edges = self.crop_with_edges(self.load_resized(B_path), self.B_edges[self.B_edge_rows[B_path]])
+        else:
+            A_arr = None
+            if self.A_cache is not None:
+                A_arr = self.A_cache.get(index_A, lambda: self.load_resized(A_path))
+            if A_arr is not None:
+                A = array_transform(A_arr, self.opt)
+            else:
+                A_img = default_loader(A_path, self.draft_size)
+                if size is not None:
+                    A_img = fit_to_size(A_img, size, self.opt)
+                A = self.transform(A_img)
 
-        A = self.transform(A_img)
-        B = self.transform(B_img)
+            B_img = default_loader(B_path, self.draft_size)
+            if size is not None:
+                B_img = fit_to_size(B_img, size, self.opt)
+            B = self.transform(B_img)
         if self.opt.which_direction == 'BtoA':
             input_nc = self.opt.output_nc
             output_nc = self.opt.input_nc
@@ -40,15 +116,17 @@ class UnalignedDataset(BaseDataset):
             input_nc = self.opt.input_nc
             output_nc = self.opt.output_nc
 
-        if input_nc == 1:  # RGB to gray
-            tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-            A = tmp.unsqueeze(0)
+        if input_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+            A = rgb_to_gray(A)
 
-        if output_nc == 1:  # RGB to gray
-            tmp = B[0, ...] * 0.299 + B[1, ...] * 0.587 + B[2, ...] * 0.114
-            B = tmp.unsqueeze(0)
-        return {'A': A, 'B': B,
+        if output_nc == 1 and not self.opt.batch_augment:  # RGB to gray
+            B = rgb_to_gray(B)
+        item = {'A': A, 'B': B,
                 'A_paths': A_path, 'B_paths': B_path}
+        if self.opt.edge_cache:
+            item['A_edges'] = A_edges
+            item['B_edges'] = B_edges
+        return item
 
     def __len__(self):
         return max(self.A_size, self.B_size)
@@ -0,0 +1,165 @@
+###############################################################################
+# Read images straight out of zip archives, including zips nested inside
+# zips, without extracting them to disk.
+# A path inside an archive is written like a normal path through the archive
+# file, e.g. ./datasets/dlp_gan.zip/All-Paintings/paintings.zip/001.jpg
+# Every process keeps one open handle per archive; nested archives that are
+# stored uncompressed are read in place through a window on the outer file,
+# compressed ones are inflated once into memory.
+###############################################################################
+
+import io
+import os
+import struct
+import zipfile
+from functools import lru_cache
+
+from PIL import Image
+
+from data.image_folder import is_image_file
+
+# (pid, archive chain) -> ZipFile, so forked DataLoader workers reopen their own handles
+_archives = {}
+
+
+@lru_cache(maxsize=None)
+def _is_archive_file(path):
+    return path.lower().endswith('.zip') and os.path.isfile(path)
+
+
+def split_zip_path(path):
+    """Split path into (archive file on disk, member path) or return None."""
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(1, len(parts) + 1):
+        prefix = os.sep.join(parts[:i])
+        if _is_archive_file(prefix):
+            return prefix, '/'.join(parts[i:])
+    return None
+
+
+def is_zip_path(path):
+    return split_zip_path(path) is not None
+
+
+class _FileWindow(io.RawIOBase):
+    # read-only view of [offset, offset + size) of a file on disk
+    def __init__(self, path, offset, size):
+        self.f = open(path, 'rb')
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self.pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        self.pos = max(0, min(pos, self.size))
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self.pos)
+        if n <= 0:
+            return 0
+        self.f.seek(self.offset + self.pos)
+        data = self.f.read(n)
+        b[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super(_FileWindow, self).close()
+
+
+def _data_offset(zf, info):
+    # the local file header has its own name/extra lengths, read them
+    zf.fp.seek(info.header_offset)
+    header = zf.fp.read(30)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+def _open_archive(chain):
+    key = (os.getpid(), chain)
+    zf = _archives.get(key)
+    if zf is not None:
+        return zf
+    if len(chain) == 1:
+        zf = zipfile.ZipFile(chain[0], 'r')
+        zf.base_offset = 0
+    else:
+        parent = _open_archive(chain[:-1])
+        info = parent.getinfo(chain[-1])
+        if info.compress_type == zipfile.ZIP_STORED and parent.base_offset is not None:
+            offset = parent.base_offset + _data_offset(parent, info)
+            zf = zipfile.ZipFile(_FileWindow(chain[0], offset, info.file_size), 'r')
+            zf.base_offset = offset
+        else:
+            zf = zipfile.ZipFile(io.BytesIO(parent.read(info)), 'r')
+            zf.base_offset = None
+    _archives[key] = zf
+    return zf
+
+
+def _resolve(path):
+    # turn a virtual path into (archive chain, member name)
+    archive, member = split_zip_path(path)
+    chain = (archive,)
+    parts = member.split('/')
+    start = 0
+    for i, part in enumerate(parts[:-1]):
+        if part.lower().endswith('.zip'):
+            chain = chain + ('/'.join(parts[start:i + 1]),)
+            start = i + 1
+    return chain, '/'.join(parts[start:])
+
+
+def _list_images(chain, base, prefix):
+    zf = _open_archive(chain)
+    images = []
+    for info in zf.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith('__MACOSX/'):
+            continue
+        if name.lower().endswith('.zip'):
+            if prefix.startswith(name + '/'):
+                images += _list_images(chain + (name,), base + '/' + name, prefix[len(name) + 1:])
+            elif name.startswith(prefix):
+                images += _list_images(chain + (name,), base + '/' + name, '')
+        elif is_image_file(name) and name.startswith(prefix):
+            images.append(base + '/' + name)
+    return images
+
+
+def make_zip_dataset(path):
+    archive, member = split_zip_path(path)
+    prefix = member.strip('/')
+    if prefix:
+        prefix += '/'
+    return sorted(_list_images((archive,), archive, prefix))
+
+
+def zip_read(path):
+    chain, member = _resolve(path)
+    return _open_archive(chain).read(member)
+
+
+def zip_loader(path, draft_size=None):
+    from data.decoders import decode_image
+    return decode_image(zip_read(path), path, draft_size)
+
+
+def zip_image_size(path):
+    # (width, height) from the image header, without decoding
+    with Image.open(io.BytesIO(zip_read(path))) as img:
+        return img.size
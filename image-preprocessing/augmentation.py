@@ -27,15 +27,11 @@ def random_rotation(image):
     deg = random.randrange(1, 360)
     (h,w) = image.shape[:2]
     center = (w/2, h/2)
-    mean_val = [0.0, 0.0, 0.0]
-
-    for channel in range(3):
-        one_channel = image[:,:,channel]
-        outer = np.append(one_channel[0,:-1], one_channel[-1,1:])
-        tmp = np.append(one_channel[:-1,-1], one_channel[1:,0])
-        outer = np.append(outer,tmp)
-        outer = outer.flatten()
-        mean_val[channel] = np.mean(outer[outer!=0])
+
+    # per-channel mean of the nonzero border pixels
+    outer = np.concatenate([image[0,:-1], image[-1,1:], image[:-1,-1], image[1:,0]]).astype(np.float64)
+    nonzero = outer != 0
+    mean_val = ((outer * nonzero).sum(0) / np.maximum(nonzero.sum(0), 1)).tolist()
 
     M = cv2.getRotationMatrix2D(center, deg, 1.0)
     rotated = cv2.warpAffine(image, M, (w,h), borderMode = cv2.BORDER_CONSTANT, borderValue=mean_val)
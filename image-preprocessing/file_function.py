@@ -2,10 +2,12 @@ import os
 import cv2
 import sys
 import csv
+import time
+import threading
+import multiprocessing
 import augmentation as aug
 import config as cf
 import numpy as np
-from operator import div
 # qtt
 from PIL import Image
 from resizeimage import resizeimage
@@ -39,24 +41,114 @@ def read_all_imgs(in_dir):
                 print('{:<100} {:>10}'.format(file_path, str(img.shape)))
                 # print(file_path + ",img size = "+str(img.shape))
 
-# resize the imgs from in_dir, and save with exact same hierarchy in the out_dir
-def resize_images(in_dir, out_dir, target_size):
+# journal of finished resizes in the output directory: one
+# "relative source path <tab> size <tab> mtime_ns <tab> target_size" line per image
+RESIZE_LOG = ".resize_log"
+
+def read_resize_log(out_dir):
+    done = {}
+    log_path = out_dir + os.sep + RESIZE_LOG
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 4:
+                    done[fields[0]] = tuple(fields[1:])
+    return done
+
+# worker process: read, resize and atomically write images until a None task arrives
+def resize_worker(task_queue, result_queue, target_size):
+    cv2.setNumThreads(1)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        file_path, file_name = task
+        try:
+            img = cv2.imread(file_path)
+            if img is None:
+                raise IOError("cannot read image")
+            resized_img = cv2.resize(img, (target_size, target_size), interpolation = cv2.INTER_CUBIC)
+            name, ext = os.path.splitext(file_name)
+            tmp_name = name + ".tmp" + ext # keep the extension, imwrite picks the format from it
+            if not cv2.imwrite(tmp_name, resized_img):
+                raise IOError("cannot write " + tmp_name)
+            os.replace(tmp_name, file_name)
+            result_queue.put((file_path, None))
+        except Exception as e:
+            result_queue.put((file_path, str(e)))
+
+# resize the imgs from in_dir, and save with exact same hierarchy in the out_dir.
+# Runs num_workers processes fed through bounded queues. Images already resized
+# to target_size from an unchanged source (same size and mtime) are skipped, so
+# an interrupted run can simply be restarted.
+def resize_images(in_dir, out_dir, target_size, num_workers=None, report_every=10.0):
     check_and_mkdir(out_dir) # sanity check for the target output directory
+    num_workers = num_workers or multiprocessing.cpu_count()
+    done = read_resize_log(out_dir)
 
+    tasks = []
+    keys = {}
+    skipped = 0
     for subdir, dirs, files in os.walk(in_dir):
+        # do not descend into the output directory when it is inside in_dir
+        dirs[:] = [d for d in dirs if os.path.abspath(subdir + os.sep + d) != os.path.abspath(out_dir)]
         for f in files:
             file_path = subdir + os.sep + f
             if (is_image(f)):
-                img = cv2.imread(file_path)
-                print ('current file_path:',file_path)
-                resized_img = cv2.resize(img, (target_size, target_size), interpolation = cv2.INTER_CUBIC)
-                #resized_img = resizeimage.resize_cover(img, [256, 256])
                 class_dir = out_dir + os.sep + file_path.split("/")[-2]
                 check_and_mkdir(class_dir) # sanity check for the target class directory
-
                 file_name = class_dir + os.sep + file_path.split("/")[-1]
-                print(file_name)
-                cv2.imwrite(file_name, resized_img)
+
+                st = os.stat(file_path)
+                rel_path = os.path.relpath(file_path, in_dir)
+                key = (str(st.st_size), str(st.st_mtime_ns), str(target_size))
+                if done.get(rel_path) == key and os.path.exists(file_name):
+                    skipped += 1
+                    continue
+                keys[file_path] = (rel_path, key)
+                tasks.append((file_path, file_name))
+
+    print("Resizing %d images to %d with %d workers (%d up to date)" % (len(tasks), target_size, num_workers, skipped))
+    task_queue = multiprocessing.Queue(maxsize=4 * num_workers)
+    result_queue = multiprocessing.Queue(maxsize=4 * num_workers)
+    workers = [multiprocessing.Process(target=resize_worker, args=(task_queue, result_queue, target_size))
+               for _ in range(num_workers)]
+    for w in workers:
+        w.daemon = True
+        w.start()
+
+    def feed():
+        for task in tasks:
+            task_queue.put(task)
+        for _ in workers:
+            task_queue.put(None)
+    feeder = threading.Thread(target=feed)
+    feeder.daemon = True
+    feeder.start()
+
+    failed = 0
+    start_time = last_report = time.time()
+    with open(out_dir + os.sep + RESIZE_LOG, "a") as log:
+        for i in range(len(tasks)):
+            file_path, error = result_queue.get()
+            if error is not None:
+                failed += 1
+                print("[Error] : %s: %s" % (file_path, error))
+            else:
+                rel_path, key = keys[file_path]
+                log.write("\t".join((rel_path,) + key) + "\n")
+                log.flush()
+            if time.time() - last_report >= report_every:
+                last_report = time.time()
+                print("%d / %d images, %.1f images/s" % (i + 1, len(tasks), (i + 1) / (last_report - start_time)))
+
+    feeder.join()
+    for w in workers:
+        w.join()
+    elapsed = time.time() - start_time
+    print("Resized %d images in %.1fs (%.1f images/s), %d skipped, %d failed" %
+          (len(tasks) - failed, elapsed, len(tasks) / max(elapsed, 1e-6), skipped, failed))
 
 # count the direct one-step sub directories (which will represent the class name)
 def class_info(in_dir, mode):
@@ -146,37 +238,18 @@ def aug_train(split_dir):
                     rot_dir = (subdir + os.sep + name + "_aug_"+str(i+1)+ext)
                     cv2.imwrite(rot_dir, aug.random_rotation(img))
 
-def train_mean(split_dir):
-    train_dir = split_dir + os.sep + "train"
-    train_img_num = 0
-    train_mean_lst = [0.0, 0.0, 0.0]
-
-    for subdir, dirs, files in os.walk(train_dir):
-        for f in files:
-            file_path = subdir + os.sep + f
-            if (is_image(f)):
-                img = cv2.imread(file_path)
-                train_img_num += 1
-                for channel in range(3):
-                    train_mean_lst[channel] += img[:,:,channel].mean()
-
-    mean_map = map(div, train_mean_lst, [train_img_num, train_img_num, train_img_num])
-    return map(div, mean_map, [255.0, 255.0, 255.0])
+# exact per-channel RGB mean/std of the training images, on the [0, 1] scale, in one
+# parallel pass (see util/dataset_stats.py of the main repository)
+def train_meanstd(split_dir, num_workers=None):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+    from util.dataset_stats import dataset_stats
 
-def train_std(split_dir, train_mean):
     train_dir = split_dir + os.sep + "train"
-    train_img_num = 0
-    train_std_lst = [0.0, 0.0, 0.0]
-
+    paths = []
     for subdir, dirs, files in os.walk(train_dir):
         for f in files:
-            file_path = subdir + os.sep + f
             if (is_image(f)):
-                img = cv2.imread(file_path)
-                train_img_num += 1
-                for channel in range(3):
-                    train_std_lst[channel] += img[:,:,channel].var() # per image var()
+                paths.append(subdir + os.sep + f)
 
-    std_map = map(div, train_std_lst, [train_img_num, train_img_num, train_img_num])
-    std_map = np.sqrt(std_map)
-    return map(div, std_map, [255.0, 255.0, 255.0])
+    stats = dataset_stats(sorted(paths), num_workers=num_workers)
+    return stats['mean'], stats['std']
@@ -10,7 +10,7 @@ if __name__ == "__main__":
         print("################## [ Options ] ###########################")
         print("# Mode 1 'print' : Print names of image data file")
         print("# Mode 2 'read'  : [original/aug] Read names data")
-        print("# Mode 3 'resize': [target_size]  Resize & Orgnaize data")
+        print("# Mode 3 'resize': [target_size] [workers] Resize & Orgnaize data")
         print("# Mode 4 'split' : Create a train-validation split of data")
         print("# Mode 5 'check' : Check the distribution of data")
         print("##########################################################")
@@ -47,7 +47,8 @@ if __name__ == "__main__":
         else:
             ff.check_and_mkdir(cf.resize_base)
             target_size = int(sys.argv[2])
-            ff.resize_images(cf.data_base, cf.resize_dir, target_size)
+            num_workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+            ff.resize_images(cf.data_base, cf.resize_dir, target_size, num_workers)
     #############################################
 
     #############################################
@@ -77,8 +78,7 @@ if __name__ == "__main__":
     #############################################
     # @ Module 7 : Retrieve Training data meanstd
     if (mode == 'meanstd'):
-        mean = ff.train_mean(cf.split_dir)
+        mean, std = ff.train_meanstd(cf.split_dir)
         print(mean)
-        std = ff.train_std(cf.split_dir, mean)
         print(std)
     #############################################
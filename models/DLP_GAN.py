@@ -8,6 +8,8 @@ from util.image_pool import ImagePool
 from .base_model import BaseModel
 from . import networks
 from . import transforms
+from .feature_cache import FeatureCache, deterministic_crop
+from . import loss_networks
 from .networks_.dexined import DexiNed, init_dexined
 import lpips
 
@@ -40,6 +42,15 @@ class DLP_GAN(BaseModel):
         # Freeze DexiNed parameters
         for param in self.dexinedNet.parameters():
             param.requires_grad = False
+        # running BatchNorm statistics: the edge map of an image does not depend
+        # on the rest of the batch, so real and fake images can share a batch
+        self.dexinedNet.eval()
+        # trans_dexinet folded into the first conv, takes [-1, 1] images
+        self.dexinedNet = transforms.fold_dexinet(self.dexinedNet)
+        self.input_A_edges = self.Tensor()
+        self.input_B_edges = self.Tensor()
+        self.real_A_edges = None
+        self.real_B_edges = None
 
         # Initialize LPIPS loss
         self.lpips_loss = lpips.LPIPS(net='vgg')
@@ -47,6 +58,11 @@ class DLP_GAN(BaseModel):
         
         # Load VGG16
         self.vggNet = self.lpips_loss.net
+        # VGG features of the real and reconstructed images for the feature loss,
+        # from a copy of the trunk with trans_vgg folded into the first conv
+        # (LPIPS itself keeps its own input scaling)
+        self.vgg_features = FeatureCache(transforms.fold_vgg(self.vggNet), None, 2,
+                                         opt.vgg_cache_mb * 1024 * 1024, deterministic_crop(opt))
         
         if self.isTrain:
             use_sigmoid = opt.no_lsgan
@@ -101,9 +117,14 @@ class DLP_GAN(BaseModel):
         AtoB = self.opt.which_direction == 'AtoB'
         input_A = input['A' if AtoB else 'B']
         input_B = input['B' if AtoB else 'A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.copy_input(self.input_A, input_A)
+        self.copy_input(self.input_B, input_B)
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
+        self.B_paths = input['B_paths' if AtoB else 'A_paths']
+        if 'A_edges' in input:
+            # precomputed DexiNed edge maps of the real images (--edge_cache)
+            self.real_A_edges = self.copy_input(self.input_A_edges, input['A_edges' if AtoB else 'B_edges'])
+            self.real_B_edges = self.copy_input(self.input_B_edges, input['B_edges' if AtoB else 'A_edges'])
 
     def forward(self):
         self.real_A = Variable(self.input_A)
@@ -149,13 +170,13 @@ class DLP_GAN(BaseModel):
 
     def backward_G(self):
         opt = self.opt
+        fake_B, fake_A, rec_A, rec_B, idt_A, idt_B = self.run_generators(self.real_A, self.real_B, opt.beta > 0)
+
         # Identity loss
         if opt.beta > 0:
             # G_A should be identity if real_B is fed.
-            idt_A = self.netG_A(self.real_B)
             loss_idt_A = self.criterionIdt(idt_A, self.real_B)
             # G_B should be identity if real_A is fed.
-            idt_B = self.netG_B(self.real_A)
             loss_idt_B = self.criterionIdt(idt_B, self.real_A)
 
             self.idt_A = idt_A.data
@@ -169,33 +190,30 @@ class DLP_GAN(BaseModel):
             self.loss_idt_B = 0
 
         # GAN loss D_A(G_A(A))
-        fake_B = self.netG_A(self.real_A)
         pred_fake = self.netD_A(fake_B)
         loss_G_A = self.criterionGAN(pred_fake, True)
 
         # GAN loss D_B(G_B(B))
-        fake_A = self.netG_B(self.real_B)
         pred_fake = self.netD_B(fake_A)
         loss_G_B = self.criterionGAN(pred_fake, True)
 
 
+        # VGG features of real_A, real_B, rec_A and rec_B in one pass
+        real_A_feature, real_B_feature, rec_A_feature, rec_B_feature = \
+            self.vgg_features([self.real_A, self.real_B], [self.image_paths, self.B_paths], [rec_A, rec_B])
+
         # Forward Feature loss
-        rec_A = self.netG_B(fake_B)
-        real_A_feature = Variable(self.vggNet.forward(transforms.trans_vgg(self.real_A))[2].data, requires_grad=False)
-        rec_A_feature = Variable(self.vggNet.forward(transforms.trans_vgg(rec_A))[2].data, requires_grad=True)
+        rec_A_feature = Variable(rec_A_feature.data, requires_grad=True)
         loss_feature_A = self.criterionCycle(real_A_feature, rec_A_feature)
 
         # Backward Feature loss
-        rec_B = self.netG_A(fake_A)
-        real_B_feature = Variable(self.vggNet.forward(transforms.trans_vgg(self.real_B))[2].data, requires_grad=False)
-        rec_B_feature = Variable(self.vggNet.forward(transforms.trans_vgg(rec_B))[2].data, requires_grad=True)
+        rec_B_feature = Variable(rec_B_feature.data, requires_grad=True)
         loss_feature_B = self.criterionCycle(real_B_feature, rec_B_feature)
 
 
-        #content realA_fakeB using DexiNed + LPIPS
-        loss_semantic_A = self.dexined_lpips_loss(self.real_A, fake_B)
-        #content realB_fakeA using DexiNed + LPIPS  
-        loss_semantic_B = self.dexined_lpips_loss(self.real_B, fake_A)
+        #content realA_fakeB and realB_fakeA using DexiNed + LPIPS
+        loss_semantic_A, loss_semantic_B = self.dexined_lpips_loss([self.real_A, self.real_B], [fake_B, fake_A],
+                                                                   [self.real_A_edges, self.real_B_edges])
 
         
         # DLP_GAN paper loss function
@@ -246,18 +264,18 @@ class DLP_GAN(BaseModel):
             ret_errors['idt_B'] = self.loss_idt_B
         return ret_errors
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.input_A)
-        fake_B = util.tensor2im(self.fake_B)
-        rec_A = util.tensor2im(self.rec_A)
-        real_B = util.tensor2im(self.input_B)
-        fake_A = util.tensor2im(self.fake_A)
-        rec_B = util.tensor2im(self.rec_B)
+    def get_current_visuals(self, index=0):
+        real_A = util.tensor2im(self.input_A, index=index)
+        fake_B = util.tensor2im(self.fake_B, index=index)
+        rec_A = util.tensor2im(self.rec_A, index=index)
+        real_B = util.tensor2im(self.input_B, index=index)
+        fake_A = util.tensor2im(self.fake_A, index=index)
+        rec_B = util.tensor2im(self.rec_B, index=index)
         ret_visuals = OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('rec_A', rec_A),
                                    ('real_B', real_B), ('fake_A', fake_A), ('rec_B', rec_B)])
         if self.opt.isTrain and self.opt.identity > 0.0:
-            ret_visuals['idt_A'] = util.tensor2im(self.idt_A)
-            ret_visuals['idt_B'] = util.tensor2im(self.idt_B)
+            ret_visuals['idt_A'] = util.tensor2im(self.idt_A, index=index)
+            ret_visuals['idt_B'] = util.tensor2im(self.idt_B, index=index)
         return ret_visuals
 
     def save(self, label):
@@ -266,28 +284,18 @@ class DLP_GAN(BaseModel):
         self.save_network(self.netG_B, 'G_B', label, self.gpu_ids)
         self.save_network(self.netD_B, 'D_B', label, self.gpu_ids)
 
-    def dexined_lpips_loss(self, real_img, fake_img):
+    def dexined_lpips_loss(self, real_imgs, fake_imgs, real_edges=None):
         """
-        Compute LPIPS loss using DexiNed output
+        Compute LPIPS losses using DexiNed output
         
         Args:
-            real_img: Real image tensor
-            fake_img: Fake image tensor
+            real_imgs: List of real image tensors
+            fake_imgs: List of fake image tensors
+            real_edges: List of precomputed DexiNed outputs of real_imgs (None entries if not precomputed)
             
         Returns:
-            LPIPS loss value
+            List of LPIPS loss values, one per (real, fake) pair
         """
-        # Pass through DexiNed and get the last output
-        real_dexined_output = self.dexinedNet(transforms.trans_dexinet(real_img))[-1]
-        fake_dexined_output = self.dexinedNet(transforms.trans_dexinet(fake_img))[-1]
-        
-        # Convert single channel edge maps to 3-channel for LPIPS
-        # Repeat the channel dimension to make it RGB-like
-        real_dexined_3ch = real_dexined_output.repeat(1, 3, 1, 1)
-        fake_dexined_3ch = fake_dexined_output.repeat(1, 3, 1, 1)
-        
-        # Compute LPIPS loss directly on DexiNed outputs
-        # LPIPS internally extracts VGG features and computes loss for all layers
-        lpips_loss = self.lpips_loss(real_dexined_3ch, fake_dexined_3ch)
-        
-        return lpips_loss.mean()
+        if real_edges is not None and any(edges is None for edges in real_edges):
+            real_edges = None
+        return loss_networks.dexined_lpips(self.dexinedNet, self.lpips_loss, real_imgs, fake_imgs, real_edges)
@@ -8,6 +8,7 @@ from util.image_pool import ImagePool
 from .base_model import BaseModel
 from . import networks
 from . import transforms
+from .feature_cache import FeatureCache, deterministic_crop
 from lpips.pretrained_networks import vgg16
 
 class DSTN(BaseModel):
@@ -32,6 +33,11 @@ class DSTN(BaseModel):
         
         self.vggNet = vgg16(requires_grad=False, pretrained=True)
         self.vggNet.cuda()
+        # trans_vgg folded into the first conv, takes [-1, 1] images
+        self.vggNet = transforms.fold_vgg(self.vggNet)
+        # VGG features of the real and fake images for the content loss
+        self.vgg_features = FeatureCache(self.vggNet, None, 1,
+                                         opt.vgg_cache_mb * 1024 * 1024, deterministic_crop(opt))
 
         if self.isTrain:
             use_sigmoid = opt.no_lsgan
@@ -85,9 +91,10 @@ class DSTN(BaseModel):
         AtoB = self.opt.which_direction == 'AtoB'
         input_A = input['A' if AtoB else 'B']
         input_B = input['B' if AtoB else 'A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.copy_input(self.input_A, input_A)
+        self.copy_input(self.input_B, input_B)
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
+        self.B_paths = input['B_paths' if AtoB else 'A_paths']
 
     def forward(self):
         self.real_A = Variable(self.input_A)
@@ -133,13 +140,13 @@ class DSTN(BaseModel):
 
     def backward_G(self):
         opt = self.opt
+        fake_B, fake_A, rec_A, rec_B, idt_A, idt_B = self.run_generators(self.real_A, self.real_B, opt.beta > 0)
+
         # Identity loss
         if opt.beta > 0:
             # G_A should be identity if real_B is fed.
-            idt_A = self.netG_A(self.real_B)
             loss_idt_A = self.criterionIdt(idt_A, self.real_B)
             # G_B should be identity if real_A is fed.
-            idt_B = self.netG_B(self.real_A)
             loss_idt_B = self.criterionIdt(idt_B, self.real_A)
 
             self.idt_A = idt_A.data
@@ -153,30 +160,27 @@ class DSTN(BaseModel):
             self.loss_idt_B = 0
 
         # GAN loss D_A(G_A(A))
-        fake_B = self.netG_A(self.real_A)
         pred_fake = self.netD_A(fake_B)
         loss_G_A = self.criterionGAN(pred_fake, True)
 
         # GAN loss D_B(G_B(B))
-        fake_A = self.netG_B(self.real_B)
         pred_fake = self.netD_B(fake_A)
         loss_G_B = self.criterionGAN(pred_fake, True)
 
         # Forward cycle loss
-        rec_A = self.netG_B(fake_B)
         loss_cycle_A = self.criterionCycle(rec_A, self.real_A)
 
         # Backward cycle loss
-        rec_B = self.netG_A(fake_A)
         loss_cycle_B = self.criterionCycle(rec_B, self.real_B)
 
+        # VGG features of real_A, real_B, fake_B and fake_A in one pass
+        real_A_content, real_B_content, fake_B_content, fake_A_content = \
+            self.vgg_features([self.real_A, self.real_B], [self.image_paths, self.B_paths], [fake_B, fake_A])
         #content realA_fakeB
-        real_A_content = Variable(self.vggNet.forward(transforms.trans_vgg(self.real_A))[1].data, requires_grad=False)
-        fake_B_content = Variable(self.vggNet.forward(transforms.trans_vgg(fake_B))[1].data, requires_grad=True)
+        fake_B_content = Variable(fake_B_content.data, requires_grad=True)
         loss_Content_A = self.criterionContent(fake_B_content, real_A_content)
         #content realB_fakeA
-        real_B_content = Variable(self.vggNet.forward(transforms.trans_vgg(self.real_B))[1].data, requires_grad=False)
-        fake_A_content = Variable(self.vggNet.forward(transforms.trans_vgg(fake_A))[1].data, requires_grad=True)
+        fake_A_content = Variable(fake_A_content.data, requires_grad=True)
         loss_Content_B = self.criterionContent(fake_A_content, real_B_content)
 
         # combined loss
@@ -222,18 +226,18 @@ class DSTN(BaseModel):
             ret_errors['idt_B'] = self.loss_idt_B
         return ret_errors
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.input_A)
-        fake_B = util.tensor2im(self.fake_B)
-        rec_A = util.tensor2im(self.rec_A)
-        real_B = util.tensor2im(self.input_B)
-        fake_A = util.tensor2im(self.fake_A)
-        rec_B = util.tensor2im(self.rec_B)
+    def get_current_visuals(self, index=0):
+        real_A = util.tensor2im(self.input_A, index=index)
+        fake_B = util.tensor2im(self.fake_B, index=index)
+        rec_A = util.tensor2im(self.rec_A, index=index)
+        real_B = util.tensor2im(self.input_B, index=index)
+        fake_A = util.tensor2im(self.fake_A, index=index)
+        rec_B = util.tensor2im(self.rec_B, index=index)
         ret_visuals = OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('rec_A', rec_A),
                                    ('real_B', real_B), ('fake_A', fake_A), ('rec_B', rec_B)])
         if self.opt.isTrain and self.opt.identity > 0.0:
-            ret_visuals['idt_A'] = util.tensor2im(self.idt_A)
-            ret_visuals['idt_B'] = util.tensor2im(self.idt_B)
+            ret_visuals['idt_A'] = util.tensor2im(self.idt_A, index=index)
+            ret_visuals['idt_B'] = util.tensor2im(self.idt_B, index=index)
         return ret_visuals
 
     def save(self, label):
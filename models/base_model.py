@@ -16,6 +16,14 @@ class BaseModel():
     def set_input(self, input):
         self.input = input
 
+    # copy a batch into a preallocated input buffer; uint8 batches
+    # (--uint8_transport) are normalized to [-1, 1] in place in the buffer
+    def copy_input(self, buffer, input):
+        buffer.resize_(input.size()).copy_(input)
+        if input.dtype == torch.uint8:
+            buffer.div_(127.5).sub_(1.0)
+        return buffer
+
     def forward(self):
         pass
 
@@ -29,7 +37,7 @@ class BaseModel():
     def optimize_parameters(self):
         pass
 
-    def get_current_visuals(self):
+    def get_current_visuals(self, index=0):
         return self.input
 
     def get_current_errors(self):
@@ -38,6 +46,34 @@ class BaseModel():
     def save(self, label):
         pass
 
+    # net applied to each of inputs in one call on their concatenation along
+    # the batch dimension, split back into one output per input. Instance norm
+    # and dropout treat every sample on its own, batch norm would mix the
+    # statistics of the inputs, so then they are run one by one. Inputs of
+    # different sizes (scale_width without bucket_batches) are run one by one
+    # too.
+    def run_batched(self, net, *inputs):
+        same_size = all(input.shape[1:] == inputs[0].shape[1:] for input in inputs)
+        if len(inputs) == 1 or self.opt.norm == 'batch' or not same_size:
+            return [net(input) for input in inputs]
+        output = net(torch.cat(inputs, 0))
+        return list(torch.split(output, [input.size(0) for input in inputs], 0))
+
+    # generator calls of a cycle consistency backward_G with netG_A and netG_B.
+    # G_B runs first (with the identity input real_A), so that G_A can take
+    # real_A, real_B and fake_A in one batched call; only rec_A needs a second
+    # call of G_B. idt_A and idt_B are None without the identity loss.
+    def run_generators(self, real_A, real_B, identity):
+        idt_A = idt_B = None
+        if identity:
+            fake_A, idt_B = self.run_batched(self.netG_B, real_B, real_A)
+            fake_B, idt_A, rec_B = self.run_batched(self.netG_A, real_A, real_B, fake_A)
+        else:
+            fake_A = self.netG_B(real_B)
+            fake_B, rec_B = self.run_batched(self.netG_A, real_A, fake_A)
+        rec_A = self.netG_B(fake_B)
+        return fake_B, fake_A, rec_A, rec_B, idt_A, idt_B
+
     # helper saving function that can be used by subclasses
     def save_network(self, network, network_label, epoch_label, gpu_ids):
         save_filename = '%s_net_%s.pth' % (epoch_label, network_label)
@@ -53,8 +89,9 @@ class BaseModel():
         network.load_state_dict(torch.load(save_path))
 
     # update learning rate (called once every epoch)
-    def update_learning_rate(self):
+    def update_learning_rate(self, verbose=True):
         for scheduler in self.schedulers:
             scheduler.step()
         lr = self.optimizers[0].param_groups[0]['lr']
-        print('learning rate = %.7f' % lr)
+        if verbose:
+            print('learning rate = %.7f' % lr)
@@ -81,8 +81,8 @@ class CycleGANModel(BaseModel):
         AtoB = self.opt.which_direction == 'AtoB'
         input_A = input['A' if AtoB else 'B']
         input_B = input['B' if AtoB else 'A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.copy_input(self.input_A, input_A)
+        self.copy_input(self.input_B, input_B)
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
 
     def forward(self):
@@ -205,18 +205,18 @@ class CycleGANModel(BaseModel):
             ret_errors['idt_B'] = self.loss_idt_B
         return ret_errors
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.input_A)
-        fake_B = util.tensor2im(self.fake_B)
-        rec_A = util.tensor2im(self.rec_A)
-        real_B = util.tensor2im(self.input_B)
-        fake_A = util.tensor2im(self.fake_A)
-        rec_B = util.tensor2im(self.rec_B)
+    def get_current_visuals(self, index=0):
+        real_A = util.tensor2im(self.input_A, index=index)
+        fake_B = util.tensor2im(self.fake_B, index=index)
+        rec_A = util.tensor2im(self.rec_A, index=index)
+        real_B = util.tensor2im(self.input_B, index=index)
+        fake_A = util.tensor2im(self.fake_A, index=index)
+        rec_B = util.tensor2im(self.rec_B, index=index)
         ret_visuals = OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('rec_A', rec_A),
                                    ('real_B', real_B), ('fake_A', fake_A), ('rec_B', rec_B)])
         if self.opt.isTrain and self.opt.identity > 0.0:
-            ret_visuals['idt_A'] = util.tensor2im(self.idt_A)
-            ret_visuals['idt_B'] = util.tensor2im(self.idt_B)
+            ret_visuals['idt_A'] = util.tensor2im(self.idt_A, index=index)
+            ret_visuals['idt_B'] = util.tensor2im(self.idt_B, index=index)
         return ret_visuals
 
     def save(self, label):
@@ -80,8 +80,8 @@ class CycleGANModel(BaseModel):
         AtoB = self.opt.which_direction == 'AtoB'
         input_A = input['A' if AtoB else 'B']
         input_B = input['B' if AtoB else 'A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.copy_input(self.input_A, input_A)
+        self.copy_input(self.input_B, input_B)
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
 
     def forward(self):
@@ -130,13 +130,13 @@ class CycleGANModel(BaseModel):
         lambda_idt = self.opt.identity
         lambda_A = self.opt.lambda_A
         lambda_B = self.opt.lambda_B
+        fake_B, fake_A, rec_A, rec_B, idt_A, idt_B = self.run_generators(self.real_A, self.real_B, lambda_idt > 0)
+
         # Identity loss
         if lambda_idt > 0:
             # G_A should be identity if real_B is fed.
-            idt_A = self.netG_A(self.real_B)
             loss_idt_A = self.criterionIdt(idt_A, self.real_B) * lambda_B * lambda_idt
             # G_B should be identity if real_A is fed.
-            idt_B = self.netG_B(self.real_A)
             loss_idt_B = self.criterionIdt(idt_B, self.real_A) * lambda_A * lambda_idt
 
             self.idt_A = idt_A.data
@@ -150,21 +150,17 @@ class CycleGANModel(BaseModel):
             self.loss_idt_B = 0
 
         # GAN loss D_A(G_A(A))
-        fake_B = self.netG_A(self.real_A)
         pred_fake = self.netD_A(fake_B)
         loss_G_A = self.criterionGAN(pred_fake, True)
 
         # GAN loss D_B(G_B(B))
-        fake_A = self.netG_B(self.real_B)
         pred_fake = self.netD_B(fake_A)
         loss_G_B = self.criterionGAN(pred_fake, True)
 
         # Forward cycle loss
-        rec_A = self.netG_B(fake_B)
         loss_cycle_A = self.criterionCycle(rec_A, self.real_A) * lambda_A
 
         # Backward cycle loss
-        rec_B = self.netG_A(fake_A)
         loss_cycle_B = self.criterionCycle(rec_B, self.real_B) * lambda_B
         # combined loss
         loss_G = loss_G_A + loss_G_B + loss_cycle_A + loss_cycle_B + loss_idt_A + loss_idt_B
@@ -204,18 +200,18 @@ class CycleGANModel(BaseModel):
             ret_errors['idt_B'] = self.loss_idt_B
         return ret_errors
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.input_A)
-        fake_B = util.tensor2im(self.fake_B)
-        rec_A = util.tensor2im(self.rec_A)
-        real_B = util.tensor2im(self.input_B)
-        fake_A = util.tensor2im(self.fake_A)
-        rec_B = util.tensor2im(self.rec_B)
+    def get_current_visuals(self, index=0):
+        real_A = util.tensor2im(self.input_A, index=index)
+        fake_B = util.tensor2im(self.fake_B, index=index)
+        rec_A = util.tensor2im(self.rec_A, index=index)
+        real_B = util.tensor2im(self.input_B, index=index)
+        fake_A = util.tensor2im(self.fake_A, index=index)
+        rec_B = util.tensor2im(self.rec_B, index=index)
         ret_visuals = OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('rec_A', rec_A),
                                    ('real_B', real_B), ('fake_A', fake_A), ('rec_B', rec_B)])
         if self.opt.isTrain and self.opt.identity > 0.0:
-            ret_visuals['idt_A'] = util.tensor2im(self.idt_A)
-            ret_visuals['idt_B'] = util.tensor2im(self.idt_B)
+            ret_visuals['idt_A'] = util.tensor2im(self.idt_A, index=index)
+            ret_visuals['idt_B'] = util.tensor2im(self.idt_B, index=index)
         return ret_visuals
 
     def save(self, label):
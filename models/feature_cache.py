@@ -0,0 +1,89 @@
+import torch
+from collections import OrderedDict
+
+from .loss_networks import run_by_shape
+
+
+def deterministic_crop(opt):
+    """(load size, top, left, crop size) of the crop every training image
+    gets, None when the crops or flips are random."""
+    if opt.batch_augment or not opt.no_flip or opt.num_crops > 1:
+        return None
+    if opt.resize_or_crop == 'resize_and_crop' and opt.loadSize == opt.fineSize:
+        return (opt.loadSize, 0, 0, opt.fineSize)
+    return None
+
+
+class FeatureCache():
+    """Features of a frozen network (one layer of its outputs) computed under
+    no_grad, for the real images of a batch and other images (e.g. fakes)
+    in a single pass of the network.
+
+    With max_bytes > 0 and a deterministic crop, the features of every real
+    image are kept across steps, keyed by image path and crop box, and only
+    the real images not in the cache are run through the network. The least
+    recently used features are evicted once they take more than max_bytes.
+    """
+
+    def __init__(self, net, transform, layer, max_bytes=0, crop=None):
+        self.net = net
+        self.transform = transform
+        self.layer = layer
+        self.max_bytes = max_bytes
+        self.crop = crop
+        self.persistent = max_bytes > 0 and crop is not None
+        if max_bytes > 0 and crop is None:
+            print('feature cache disabled: training crops/flips are random (needs resize_and_crop with loadSize == fineSize and --no_flip)')
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def compute(self, images):
+        with torch.no_grad():
+            if self.transform is not None:
+                images = self.transform(images)
+            return self.net.forward(images)[self.layer]
+
+    def __call__(self, reals, paths=None, others=()):
+        """List of the features of every tensor in reals (paths: the list of
+        image paths of each) followed by those of every tensor in others.
+        Tensors of the same size share a pass of the network."""
+        if not self.persistent or paths is None:
+            return run_by_shape(self.compute, list(reals) + list(others))
+
+        # per real tensor: cached features by position, and missing positions
+        found = []
+        missing = []
+        for batch_paths in paths:
+            batch_found = {}
+            for j, path in enumerate(batch_paths):
+                key = (path,) + self.crop
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    batch_found[j] = self.entries[key]
+            found.append(batch_found)
+            missing.append([j for j in range(len(batch_paths)) if j not in batch_found])
+            self.hits += len(batch_found)
+            self.misses += len(missing[-1])
+
+        todo = [k for k in range(len(reals)) if len(missing[k]) > 0]
+        outputs = run_by_shape(self.compute, [reals[k][missing[k]] for k in todo] + list(others))
+        for k, features in zip(todo, outputs):
+            for j, feature in zip(missing[k], features):
+                # a copy, a view would keep the whole batch alive
+                found[k][j] = feature.clone()
+                self.put((paths[k][j],) + self.crop, found[k][j])
+        real_features = [torch.stack([found[k][j] for j in range(len(paths[k]))]) for k in range(len(reals))]
+        return real_features + outputs[len(todo):]
+
+    def put(self, key, feature):
+        # a path can appear twice in one batch (B is drawn with replacement)
+        if key in self.entries:
+            old = self.entries.pop(key)
+            self.nbytes -= old.nelement() * old.element_size()
+        self.entries[key] = feature
+        self.nbytes += feature.nelement() * feature.element_size()
+        while self.nbytes > self.max_bytes and len(self.entries) > 0:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nelement() * evicted.element_size()
@@ -0,0 +1,69 @@
+import torch
+import lpips
+
+
+def run_by_shape(fn, inputs):
+    """[fn(x) for x in inputs] with one call of fn per input shape: inputs of
+    the same (C, H, W) are concatenated along the batch dimension. A and B
+    images differ in size with scale_width and no bucket_batches."""
+    groups = {}
+    for i, x in enumerate(inputs):
+        groups.setdefault(tuple(x.shape[1:]), []).append(i)
+    outputs = [None] * len(inputs)
+    for indices in groups.values():
+        output = fn(torch.cat([inputs[i] for i in indices], 0))
+        for i, out in zip(indices, torch.split(output, [inputs[i].size(0) for i in indices], 0)):
+            outputs[i] = out
+    return outputs
+
+
+def lpips_distance(loss, in0, in1):
+    """loss(in0, in1) of an lpips.LPIPS module (lpips, not spatial) with the
+    features of both inputs from one pass of its trunk network."""
+    assert loss.lpips and not loss.spatial
+    n = in0.size(0)
+    x = torch.cat([in0, in1], 0)
+    if loss.version == '0.1':
+        x = loss.scaling_layer(x)
+    outs = loss.net.forward(x)
+    val = 0
+    for kk in range(loss.L):
+        feats = lpips.normalize_tensor(outs[kk])
+        diff = (feats[:n] - feats[n:]) ** 2
+        val = val + lpips.spatial_average(loss.lins[kk](diff), keepdim=True)
+    return val
+
+
+def dexined_lpips(dexined, lpips_loss, real_imgs, fake_imgs, real_edges=None):
+    """
+    LPIPS between the DexiNed edge maps of every (real, fake) pair
+
+    Args:
+        dexined: DexiNed folded with transforms.fold_dexinet (eval mode)
+        lpips_loss: lpips.LPIPS module
+        real_imgs: list of real image tensors
+        fake_imgs: list of fake image tensors, one per real tensor
+        real_edges: list of precomputed DexiNed outputs of real_imgs, or None
+
+    Returns:
+        list of LPIPS loss values, one per pair
+
+    All images of one size go through DexiNed in one batch and all edge-map
+    pairs of one size through the LPIPS trunk in one batch.
+    """
+    def edges(x):
+        return dexined(x)[-1]
+
+    if real_edges is None:
+        outputs = run_by_shape(edges, real_imgs + fake_imgs)
+        real_outputs, fake_outputs = outputs[:len(real_imgs)], outputs[len(real_imgs):]
+    else:
+        real_outputs, fake_outputs = real_edges, run_by_shape(edges, fake_imgs)
+
+    def distance(pairs):
+        # Convert single channel edge maps to 3-channel for LPIPS
+        return lpips_distance(lpips_loss, pairs[:, :1].repeat(1, 3, 1, 1), pairs[:, 1:].repeat(1, 3, 1, 1))
+
+    # real and fake edge maps of a pair side by side as 2 channels
+    pairs = [torch.cat([real, fake], 1) for real, fake in zip(real_outputs, fake_outputs)]
+    return [d.mean() for d in run_by_shape(distance, pairs)]
@@ -1,19 +1,19 @@
 def create_model(opt):
     print(opt.model)
     if opt.model == 'cyclegan':
-        assert(opt.dataset_mode == 'unaligned')
+        assert(opt.dataset_mode in ['unaligned', 'packed', 'shards'])
         from .cyclegan import CycleGANModel
         model = CycleGANModel()
     elif opt.model == 'DSTN':
-        assert(opt.dataset_mode == 'unaligned')
+        assert(opt.dataset_mode in ['unaligned', 'packed', 'shards'])
         from .DSTN import DSTN
         model = DSTN()
     elif opt.model == 'DLP_GAN':
-        assert(opt.dataset_mode == 'unaligned')
+        assert(opt.dataset_mode in ['unaligned', 'packed', 'shards'])
         from .DLP_GAN import DLP_GAN
         model = DLP_GAN()
     elif opt.model == 'test':
-        assert(opt.dataset_mode == 'single')
+        assert(opt.dataset_mode in ['single', 'stream'])
         from .test_model import TestModel
         model = TestModel()
     else:
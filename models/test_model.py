@@ -29,7 +29,7 @@ class TestModel(BaseModel):
     def set_input(self, input):
         # we need to use single_dataset mode
         input_A = input['A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
+        self.copy_input(self.input_A, input_A)
         self.image_paths = input['A_paths']
 
     def test(self):
@@ -40,7 +40,7 @@ class TestModel(BaseModel):
     def get_image_paths(self):
         return self.image_paths
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.real_A.data)
-        fake_B = util.tensor2im(self.fake_B.data)
+    def get_current_visuals(self, index=0):
+        real_A = util.tensor2im(self.real_A.data, index=index)
+        fake_B = util.tensor2im(self.fake_B.data, index=index)
         return OrderedDict([('real_A', real_A), ('fake_B', fake_B)])
@@ -1,4 +1,9 @@
+import copy
+from collections import OrderedDict
+
 import torch
+import torch.nn as nn
+import torch.nn.functional as F
 from torchvision import transforms
 
 
@@ -48,3 +53,94 @@ def trans_dexinet(content_image):
     step3 = transforms.Lambda(lambda x: x[:, [2, 1, 0], :, :])(step2)
 
     return step3
+
+
+# trans_vgg and trans_dexinet are per-channel affine maps of the generator
+# range [-1, 1]: output channel c = scale[c] * input channel perm[c] + shift[c]
+VGG_MEAN = (0.485, 0.456, 0.406)
+VGG_STD = (0.229, 0.224, 0.225)
+DEXINET_MEAN = (123.68, 116.779, 103.939)
+
+
+def vgg_affine():
+    scale = [0.5 / s for s in VGG_STD]
+    shift = [(0.5 - m) / s for m, s in zip(VGG_MEAN, VGG_STD)]
+    return scale, shift, [0, 1, 2]
+
+
+def dexinet_affine():
+    perm = [2, 1, 0]
+    return [127.5] * 3, [127.5 - DEXINET_MEAN[c] for c in perm], perm
+
+
+# scale_width or test images of many sizes would keep adding correction maps
+MAX_CORRECTIONS = 4
+
+
+class FoldedConv2d(nn.Module):
+    """
+    conv(affine(x)) of a frozen Conv2d with the input affine map folded into
+    its weights and bias.
+
+    Folding alone would zero pad x instead of affine(x), which only changes
+    the outputs whose receptive field crosses the border. The difference is
+    a fixed map per input size (conv of the constant shift image with zero
+    padding, minus the same conv without padding), computed once per size
+    and added to the output, so the result matches conv(affine(x)) exactly
+    up to float rounding.
+    """
+
+    def __init__(self, conv, scale, shift, perm):
+        super(FoldedConv2d, self).__init__()
+        assert conv.groups == 1 and conv.padding_mode == 'zeros'
+        weight = conv.weight.detach()
+        scale = weight.new_tensor(scale).view(1, -1, 1, 1)
+        shift = weight.new_tensor(shift).view(1, -1, 1, 1)
+        folded_weight = torch.zeros_like(weight)
+        folded_weight[:, perm] = weight * scale
+        bias = conv.bias.detach() if conv.bias is not None else weight.new_zeros(weight.size(0))
+        self.register_buffer('weight', folded_weight)
+        self.register_buffer('bias', bias + (weight * shift).sum((1, 2, 3)))
+        self.register_buffer('conv_weight', weight.clone())
+        self.register_buffer('shift', shift)
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+        # correction maps of the most recently used input sizes
+        self.corrections = OrderedDict()
+
+    def border_correction(self, x):
+        key = (x.shape[2:], x.device, x.dtype)
+        if key not in self.corrections:
+            shift = self.shift.to(x.dtype).expand(1, -1, x.size(2), x.size(3))
+            padded = F.conv2d(shift, self.conv_weight.to(x.dtype), None, self.stride, self.padding, self.dilation)
+            unpadded = (self.conv_weight.to(x.dtype) * shift[:, :, :1, :1]).sum((1, 2, 3)).view(1, -1, 1, 1)
+            self.corrections[key] = padded - unpadded
+            if len(self.corrections) > MAX_CORRECTIONS:
+                self.corrections.popitem(last=False)
+        self.corrections.move_to_end(key)
+        return self.corrections[key]
+
+    def forward(self, x):
+        out = F.conv2d(x, self.weight, self.bias, self.stride, self.padding, self.dilation)
+        return out + self.border_correction(x)
+
+
+def fold_input_transform(net, conv_name, affine):
+    """Copy of a frozen network taking [-1, 1] images directly: the affine
+    input transform is folded into its first conv (submodule conv_name)."""
+    net = copy.deepcopy(net)
+    parent_name, _, name = conv_name.rpartition('.')
+    parent = net.get_submodule(parent_name)
+    setattr(parent, name, FoldedConv2d(getattr(parent, name), *affine))
+    return net
+
+
+def fold_vgg(net):
+    """lpips VGG16 trunk, net(x) == vgg(trans_vgg(x))"""
+    return fold_input_transform(net, 'slice1.0', vgg_affine())
+
+
+def fold_dexinet(net):
+    """DexiNed, net(x) == dexined(trans_dexinet(x))"""
+    return fold_input_transform(net, 'block_1.conv1', dexinet_affine())
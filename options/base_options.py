@@ -22,10 +22,21 @@ class BaseOptions():
         self.parser.add_argument('--which_model_netG', type=str, default='resnet_9blocks', help='selects model to use for netG')
         self.parser.add_argument('--n_layers_D', type=int, default=3, help='only used if which_model_netD==n_layers')
         self.parser.add_argument('--gpu_ids', type=str, default='0', help='gpu ids: e.g. 0  0,1,2, 0,2. use -1 for CPU')
-        self.parser.add_argument('--dataset_mode', type=str, default='unaligned', help='chooses how datasets are loaded. [unaligned | aligned | single]')
+        self.parser.add_argument('--dataset_mode', type=str, default='unaligned', help='chooses how datasets are loaded. [unaligned | aligned | single | packed | shards | stream]')
         self.parser.add_argument('--model', type=str, default='DLP_GAN', choices=['cyclegan', 'DSTN', 'DLP_GAN', 'test'], help='chooses which model to use')
         self.parser.add_argument('--which_direction', type=str, default='AtoB', help='AtoB or BtoA')
+        self.parser.add_argument('--shuffle_buffer', type=int, default=1000, help='# encoded samples kept per domain in the shuffle buffer of the shards dataset mode')
+        self.parser.add_argument('--num_crops', type=int, default=1, help='# of random crops/flips taken from every decoded image during training (unaligned, resize_and_crop); one epoch is then num_crops times as many samples')
+        self.parser.add_argument('--crop_buffer', type=int, default=32, help='# crops kept per domain and worker in the shuffle buffer that spreads the crops of an image over batches with --num_crops')
+        self.parser.add_argument('--unaligned_sampler', action='store_true', help='if specified, draw (A, B) index pairs with UnalignedSampler: each process gets its own part of A and B and max_dataset_size shrinks the index space. Always used for unaligned and packed datasets when WORLD_SIZE > 1')
+        self.parser.add_argument('--bucket_batches', action='store_true', help='if specified with --resize_or_crop scale_width, batch images of similar aspect ratio together so that batchSize > 1 works')
+        self.parser.add_argument('--bucket_step', type=int, default=32, help='bucketed images are cropped or padded to a height that is a multiple of bucket_step')
+        self.parser.add_argument('--no_exclude', action='store_true', help='if specified, also load the near-duplicate images listed in <trainA|trainB>.exclude.txt by data/dedup.py')
+        self.parser.add_argument('--cache_A_mb', type=int, default=0, help='MB of shared memory to keep decoded trainA images (resized to loadSize) in, so they are only read and decoded once; images beyond the cap are loaded from disk. 0 disables the cache')
+        self.parser.add_argument('--edge_cache', action='store_true', help='if specified, the unaligned dataset returns the precomputed DexiNed edge maps of the real images (python -m data.edge_store) cropped and flipped like the images, and DLP_GAN runs DexiNed only on the fakes')
+        self.parser.add_argument('--vgg_cache_mb', type=int, default=0, help='MB of GPU memory to keep the VGG features of real images in across steps, keyed by image path and crop box (least recently used evicted first). Only with deterministic crops: resize_and_crop with loadSize == fineSize and --no_flip. 0 disables it')
         self.parser.add_argument('--nThreads', default=2, type=int, help='# threads for loading data')
+        self.parser.add_argument('--autotune_loader', action='store_true', help='if specified, benchmark DataLoader worker count, prefetch_factor, persistent_workers and pin_memory on the dataset and use the fastest (cached per machine and dataroot, overrides nThreads)')
         self.parser.add_argument('--checkpoints_dir', type=str, default='./checkpoints', help='models are saved here')
         self.parser.add_argument('--norm', type=str, default='instance', help='instance normalization or batch normalization')
         self.parser.add_argument('--serial_batches', action='store_true', help='if true, takes images in order to make batches, otherwise takes them randomly')
@@ -35,6 +46,11 @@ class BaseOptions():
         self.parser.add_argument('--no_dropout', action='store_true', help='no dropout for the generator')
         self.parser.add_argument('--max_dataset_size', type=int, default=float("inf"), help='Maximum number of samples allowed per dataset. If the dataset directory contains more than max_dataset_size, only a subset is loaded.')
         self.parser.add_argument('--resize_or_crop', type=str, default='resize_and_crop', help='scaling and cropping of images at load time [resize_and_crop|crop|scale_width|scale_width_and_crop]')
+        self.parser.add_argument('--decoder', type=str, default='pil', choices=['pil', 'opencv', 'torchvision', 'auto'], help='image decoder backend, auto picks the fastest per file type by a benchmark on the dataset, cached in ~/.cache/dlp_gan/decoders.json')
+        self.parser.add_argument('--no_draft', action='store_true', help='if specified, always decode JPEGs at full resolution, otherwise resize_and_crop decodes them at the smallest DCT scale (1/2, 1/4, 1/8) still >= loadSize')
+        self.parser.add_argument('--batch_augment', action='store_true', help='if specified, workers return uint8 images at loadSize and crop, flip, normalization and grayscale run on the whole batch on the model device')
+        self.parser.add_argument('--max_rotation', type=float, default=0, help='with --batch_augment, rotate training images by a random angle in [-max_rotation, max_rotation] degrees, filling the corners with the border mean')
+        self.parser.add_argument('--uint8_transport', action='store_true', help='if specified, datasets return uint8 images and the model normalizes them to [-1, 1] in set_input')
         self.parser.add_argument('--no_flip', action='store_true', help='if specified, do not flip the images for data augmentation')
         self.parser.add_argument('--init_type', type=str, default='xavier', help='network initialization [normal|xavier|kaiming|orthogonal]')
         self.parser.add_argument('--model_dir', type=str, default='./weights', help='the path to model directory')
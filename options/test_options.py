@@ -10,5 +10,8 @@ class TestOptions(BaseOptions):
         self.parser.add_argument('--phase', type=str, default='test', help='train, val, test, etc')
         self.parser.add_argument('--which_epoch', type=str, default='latest', help='which epoch to load? set to latest to use latest cached model')
         self.parser.add_argument('--how_many', type=int, default=3000, help='how many test images to run')
+        self.parser.add_argument('--stream_source', type=str, default='watch', choices=['watch', 'stdin', 'queue'], help='where the stream dataset mode gets new images from: poll dataroot, paths on stdin or paths written to the named pipe --stream_queue')
+        self.parser.add_argument('--stream_queue', type=str, default='./translate.queue', help='named pipe the stream dataset mode reads image paths from, created if missing')
+        self.parser.add_argument('--poll_interval', type=float, default=2.0, help='seconds between two scans of dataroot in the stream dataset mode')
         #self.parser.add_argument('--identity', type=float, default=0.0, help='use identity mapping. Setting identity other than 1 has an effect of scaling the weight of the identity mapping loss. For example, if the weight of the identity loss should be 10 times smaller than the weight of the reconstruction loss, please set optidentity = 0.1')
         self.isTrain = False
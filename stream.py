@@ -0,0 +1,47 @@
+###############################################################################
+# Long-running translation worker.
+# Keeps the generator loaded and translates images as they arrive, see
+# data/stream_dataset.py for the sources:
+#   python stream.py --dataroot ./inbox --model test --which_direction AtoB
+#   find ./photos -name '*.jpg' | python stream.py --dataroot . --model test --stream_source stdin
+# fake_B images are written to --results_dir; images that already have a
+# result there are skipped, so the worker can be restarted at any time.
+###############################################################################
+
+import os
+import time
+from options.test_options import TestOptions
+from data.data_loader import CreateDataLoader
+from data.stream_dataset import output_path
+from models.models import create_model
+from util import util
+
+opt = TestOptions().parse()
+opt.dataset_mode = 'stream'
+opt.nThreads = 0  # images are loaded in the main process as they arrive
+opt.batchSize = 1  # translate every image as soon as it arrives
+opt.serial_batches = True  # no shuffle
+opt.no_flip = True  # no flip
+if opt.stream_source == 'watch':
+    # results inside the watched folder would be translated again
+    assert os.path.abspath(opt.results_dir) != os.path.abspath(opt.dataroot)
+os.makedirs(opt.results_dir, exist_ok=True)
+
+data_loader = CreateDataLoader(opt)
+dataset = data_loader.load_data()
+model = create_model(opt)
+
+print('waiting for images (%s)...' % opt.stream_source)
+for data in dataset:
+    start_time = time.time()
+    model.set_input(data)
+    model.test()
+    img_path = model.get_image_paths()
+    for j in range(len(img_path)):
+        save_path = output_path(opt, img_path[j])
+        # written under another name first, so a partial file never counts as done
+        tmp_path = os.path.splitext(save_path)[0] + '.tmp.png'
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        util.save_image(model.get_current_visuals(j)['fake_B'], tmp_path)
+        os.replace(tmp_path, save_path)
+        print('%s -> %s (%.2f s)' % (img_path[j], save_path, time.time() - start_time))
@@ -8,7 +8,8 @@ from util import html
 
 opt = TestOptions().parse()
 opt.nThreads = 1   # test code only supports nThreads = 1
-opt.batchSize = 1  # test code only supports batchSize = 1
+if not opt.bucket_batches:
+    opt.batchSize = 1  # test code only supports batchSize = 1 without aspect ratio buckets
 opt.serial_batches = True  # no shuffle
 opt.no_flip = True  # no flip
 
@@ -21,13 +22,14 @@ web_dir = os.path.join(opt.dataroot, opt.results_dir, opt.name, 'GFABCD_%s_%s_%s
 webpage = html.HTML(web_dir, 'Experiment = %s, Phase = %s, Epoch = %s' % (opt.name, opt.phase, opt.which_epoch))
 # test
 for i, data in enumerate(dataset):
-    if i >= opt.how_many:
+    if i * opt.batchSize >= opt.how_many:
         break
     model.set_input(data)
     model.test()
-    visuals = model.get_current_visuals()
     img_path = model.get_image_paths()
-    print('process image... %s' % img_path)
-    visualizer.save_images(webpage, visuals, img_path)
+    for j in range(len(img_path)):
+        visuals = model.get_current_visuals(j)
+        print('process image... %s' % img_path[j])
+        visualizer.save_images(webpage, visuals, img_path[j:j + 1])
 
 webpage.save()
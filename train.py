@@ -13,41 +13,98 @@ print('#training images = %d' % dataset_size)
 model = create_model(opt)
 visualizer = Visualizer(opt)
 total_steps = 0
+# time spent waiting for the data loader since the last print
+t_data = 0.0
+print_start_time = time.time()
 
-for epoch in range(opt.epoch_count, opt.niter + opt.niter_decay + 1):
-    epoch_start_time = time.time()
-    epoch_iter = 0
 
-    for i, data in enumerate(dataset):
-        iter_start_time = time.time()
-        visualizer.reset()
-        total_steps += opt.batchSize
-        epoch_iter += opt.batchSize
-        model.set_input(data)
-        model.optimize_parameters()
-
-        if total_steps % opt.display_freq == 0:
-            save_result = total_steps % opt.update_html_freq == 0
-            visualizer.display_current_results(model.get_current_visuals(), epoch, save_result)
-
-        if total_steps % opt.print_freq == 0:
-            errors = model.get_current_errors()
-            t = (time.time() - iter_start_time) / opt.batchSize
-            visualizer.print_current_errors(epoch, epoch_iter, errors, t)
-            if opt.display_id > 0:
-                visualizer.plot_current_errors(epoch, float(epoch_iter)/dataset_size, opt, errors)
-
-        if total_steps % opt.save_latest_freq == 0:
-            print('saving the latest model (epoch %d, total_steps %d)' %
-                  (epoch, total_steps))
-            model.save('latest')
+def train_step(data, epoch, epoch_iter, iter_start_time):
+    global t_data, print_start_time
+    visualizer.reset()
+    model.set_input(data)
+    model.optimize_parameters()
 
-    if epoch % opt.save_epoch_freq == 0:
-        print('saving the model at the end of epoch %d, iters %d' %
+    if total_steps % opt.display_freq == 0:
+        save_result = total_steps % opt.update_html_freq == 0
+        visualizer.display_current_results(model.get_current_visuals(), epoch, save_result)
+
+    if total_steps % opt.print_freq == 0:
+        errors = model.get_current_errors()
+        t = (time.time() - iter_start_time) / opt.batchSize
+        data_fraction = t_data / (time.time() - print_start_time)
+        visualizer.print_current_errors(epoch, epoch_iter, errors, t, data_fraction)
+        t_data = 0.0
+        print_start_time = time.time()
+        if opt.display_id > 0:
+            visualizer.plot_current_errors(epoch, float(epoch_iter)/dataset_size, opt, errors)
+
+    if total_steps % opt.save_latest_freq == 0:
+        print('saving the latest model (epoch %d, total_steps %d)' %
               (epoch, total_steps))
         model.save('latest')
-        model.save(epoch)
 
-    print('End of epoch %d / %d \t Time Taken: %d sec' %
-          (epoch, opt.niter + opt.niter_decay, time.time() - epoch_start_time))
-    model.update_learning_rate()
+
+def train_epochs():
+    global total_steps, t_data, print_start_time
+    for epoch in range(opt.epoch_count, opt.niter + opt.niter_decay + 1):
+        epoch_start_time = time.time()
+        epoch_iter = 0
+        data_loader.set_epoch(epoch)
+        t_data = 0.0
+        print_start_time = time.time()
+        iter_data_time = time.time()
+
+        for i, data in enumerate(dataset):
+            iter_start_time = time.time()
+            t_data += iter_start_time - iter_data_time
+            total_steps += opt.batchSize
+            epoch_iter += opt.batchSize
+            train_step(data, epoch, epoch_iter, iter_start_time)
+            iter_data_time = time.time()
+
+        if epoch % opt.save_epoch_freq == 0:
+            print('saving the model at the end of epoch %d, iters %d' %
+                  (epoch, total_steps))
+            model.save('latest')
+            model.save(epoch)
+
+        print('End of epoch %d / %d \t Time Taken: %d sec' %
+              (epoch, opt.niter + opt.niter_decay, time.time() - epoch_start_time))
+        model.update_learning_rate()
+
+
+def train_iterations():
+    # a single loader iterator for the whole run: the workers are started once
+    # and the sampler never runs out. total_steps counts iterations here, and
+    # the learning rate schedule advances every iteration.
+    global total_steps, t_data
+    start_time = time.time()
+    total_steps = opt.epoch_count - 1
+    data_iter = iter(dataset)
+    iter_data_time = time.time()
+
+    while total_steps < opt.niter + opt.niter_decay:
+        data = next(data_iter)
+        iter_start_time = time.time()
+        t_data += iter_start_time - iter_data_time
+        total_steps += 1
+        # position in passes over the dataset, only for display
+        epoch, epoch_iter = divmod(total_steps * opt.batchSize, max(dataset_size, 1))
+        train_step(data, epoch + 1, epoch_iter, iter_start_time)
+
+        if total_steps % opt.save_epoch_freq == 0:
+            print('saving the model at iteration %d' % total_steps)
+            model.save('latest')
+            model.save(total_steps)
+
+        model.update_learning_rate(verbose=total_steps % opt.print_freq == 0)
+        iter_data_time = time.time()
+
+    print('End of training, %d iterations \t Time Taken: %d sec' %
+          (total_steps, time.time() - start_time))
+
+
+if opt.by_iteration:
+    train_iterations()
+else:
+    train_epochs()
@@ -0,0 +1,463 @@
+###############################################################################
+# Data pipeline micro benchmarks.
+#
+# Usage:
+#   python -m util.benchmark decode --dataroot ./datasets/lhq_1024/trainB --loadSize 286
+#   python -m util.benchmark transport --dataroot ./datasets/lhq_1024 --batchSize 8 --nThreads 4
+#   python -m util.benchmark aligned --dataroot ./datasets/facades --dataset_mode aligned
+#   python -m util.benchmark decoders --dataroot ./datasets/lhq_1024 --loadSize 286
+#   python -m util.benchmark generators --batchSize 4 --fineSize 256
+#   python -m util.benchmark feature_cache
+#   python -m util.benchmark losses --batchSize 4 --fineSize 256 --model_dir ./weights
+#   python -m util.benchmark fold --batchSize 4 --fineSize 256 --model_dir ./weights
+# Benchmarks that build a data loader accept any training option.
+###############################################################################
+
+import argparse
+import random
+import time
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from data.image_folder import make_dataset, default_loader
+
+
+def time_per_item(fn, items, repeat=1):
+    # seconds per item, best of `repeat` runs
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.time()
+        for item in items:
+            fn(item)
+        best = min(best, (time.time() - start_time) / len(items))
+    return best
+
+
+def benchmark_decode(args):
+    paths = sorted(make_dataset(args.dataroot))[:args.num_images]
+    osize = (args.loadSize, args.loadSize)
+
+    def full_decode(path):
+        return default_loader(path).resize(osize, Image.BICUBIC)
+
+    def draft_decode(path):
+        return default_loader(path, osize).resize(osize, Image.BICUBIC)
+
+    # warm up the page cache so both runs measure decoding, not disk reads
+    time_per_item(full_decode, paths)
+    t_full = time_per_item(full_decode, paths, args.repeat)
+    t_draft = time_per_item(draft_decode, paths, args.repeat)
+    print('decode + resize to %d over %d images' % (args.loadSize, len(paths)))
+    print('full decode  : %.2f ms/image' % (t_full * 1000))
+    print('draft decode : %.2f ms/image (%.1fx)' % (t_draft * 1000, t_full / t_draft))
+
+
+def make_opt(argv):
+    # training options without the side effects of BaseOptions.parse
+    from options.train_options import TrainOptions
+    options = TrainOptions()
+    options.initialize()
+    opt = options.parser.parse_args(argv)
+    opt.isTrain = True
+    opt.gpu_ids = [int(i) for i in opt.gpu_ids.split(',') if int(i) >= 0]
+    return opt
+
+
+def benchmark_transport(args, argv):
+    from data.data_loader import CreateDataLoader
+    from models.base_model import BaseModel
+
+    for uint8_transport in [False, True]:
+        opt = make_opt(argv)
+        opt.uint8_transport = uint8_transport
+        model = BaseModel()
+        model.initialize(opt)
+        buffer = model.Tensor()
+        data_loader = CreateDataLoader(opt)
+
+        nbytes = 0
+        steps = 0
+        for i, data in enumerate(data_loader):
+            if i == 0:
+                # do not count worker startup
+                start_time = time.time()
+                continue
+            for key in ['A', 'B']:
+                if key in data:
+                    nbytes += data[key].nelement() * data[key].element_size()
+                    model.copy_input(buffer, data[key])
+            if len(opt.gpu_ids) > 0:
+                torch.cuda.synchronize()
+            steps += 1
+            if steps == args.num_steps:
+                break
+        step_time = (time.time() - start_time) / max(steps, 1)
+        print('%-14s: %8.1f KiB/step, %.2f ms/step over %d steps' %
+              ('uint8 transport' if uint8_transport else 'float32', nbytes / 1024.0 / max(steps, 1),
+               step_time * 1000, steps))
+
+
+def tensor_crop_item(dataset, index):
+    # AlignedDataset.__getitem__ before the uint8 crop path: the whole AB
+    # image is tensorized, then cropped and flipped with index_select
+    opt = dataset.opt
+    AB = default_loader(dataset.AB_paths[index], dataset.draft_size)
+    AB = AB.resize((opt.loadSize * 2, opt.loadSize), Image.BICUBIC)
+    AB = transforms.Normalize((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))(transforms.ToTensor()(AB))
+    w = int(AB.size(2) / 2)
+    h = AB.size(1)
+    w_offset = random.randint(0, max(0, w - opt.fineSize - 1))
+    h_offset = random.randint(0, max(0, h - opt.fineSize - 1))
+    A = AB[:, h_offset:h_offset + opt.fineSize, w_offset:w_offset + opt.fineSize]
+    B = AB[:, h_offset:h_offset + opt.fineSize, w + w_offset:w + w_offset + opt.fineSize]
+    if (not opt.no_flip) and random.random() < 0.5:
+        idx = torch.LongTensor([i for i in range(A.size(2) - 1, -1, -1)])
+        A = A.index_select(2, idx)
+        B = B.index_select(2, idx)
+    return {'A': A, 'B': B}
+
+
+def benchmark_aligned(args, argv):
+    from data.aligned_dataset import AlignedDataset
+
+    opt = make_opt(argv)
+    opt.uint8_transport = False
+    dataset = AlignedDataset()
+    dataset.initialize(opt)
+    indices = list(range(min(len(dataset), args.num_images)))
+
+    # both paths draw the same random numbers, so the crops must match
+    for index in indices[:10]:
+        random.seed(index)
+        expected = tensor_crop_item(dataset, index)
+        random.seed(index)
+        item = dataset[index]
+        for key in ['A', 'B']:
+            assert (item[key] - expected[key]).abs().max() < 1e-5, 'crop mismatch for %s' % key
+
+    def latencies(fn):
+        times = []
+        for index in indices:
+            start_time = time.time()
+            fn(index)
+            times.append(time.time() - start_time)
+        return np.array(times) * 1000
+
+    latencies(dataset.__getitem__)  # warm up the page cache
+    print('AlignedDataset per-sample latency over %d images, loadSize %d, fineSize %d' %
+          (len(indices), opt.loadSize, opt.fineSize))
+    for label, fn in [('tensor crop', lambda index: tensor_crop_item(dataset, index)),
+                      ('uint8 crop', dataset.__getitem__)]:
+        t = latencies(fn)
+        print('%-12s: mean %.2f ms, p50 %.2f ms, p95 %.2f ms' %
+              (label, t.mean(), np.percentile(t, 50), np.percentile(t, 95)))
+
+
+def benchmark_decoders(args, argv):
+    from data.base_dataset import get_draft_size
+    from data import decoders
+
+    opt = make_opt(argv)
+    draft_size = get_draft_size(opt)
+    choice, timings = decoders.benchmark_decoders(decoders.dataset_paths(opt), draft_size,
+                                                  args.num_images, args.repeat)
+    print('decode + resize to %s, ms/image over up to %d images per file type' % (draft_size, args.num_images))
+    for ext in sorted(timings):
+        print('%-6s: %s -> %s' % (ext, ', '.join('%s %.2f' % (name, t) for name, t in sorted(timings[ext].items())),
+                                  choice[ext]))
+    decoders.record_choice(opt.dataroot, draft_size, choice, timings)
+    print('recorded in %s, used with --decoder auto' % decoders.CACHE_PATH)
+
+
+def separate_generators(netG_A, netG_B, real_A, real_B):
+    # the generator calls of backward_G before batching
+    idt_A = netG_A(real_B)
+    idt_B = netG_B(real_A)
+    fake_B = netG_A(real_A)
+    fake_A = netG_B(real_B)
+    rec_A = netG_B(fake_B)
+    rec_B = netG_A(fake_A)
+    return [fake_B, fake_A, rec_A, rec_B, idt_A, idt_B]
+
+
+def generator_loss(outputs, real_A, real_B):
+    fake_B, fake_A, rec_A, rec_B, idt_A, idt_B = outputs
+    l1 = torch.nn.L1Loss()
+    # fake means stand in for the discriminator terms
+    return fake_B.mean() + fake_A.mean() + l1(rec_A, real_A) + l1(rec_B, real_B) \
+        + 0.5 * (l1(idt_A, real_B) + l1(idt_B, real_A))
+
+
+def benchmark_generators(args, argv):
+    from models.base_model import BaseModel
+    from models import networks
+
+    opt = make_opt(argv)
+    # dropout would draw different masks in the two runs
+    opt.no_dropout = True
+    model = BaseModel()
+    model.initialize(opt)
+    torch.manual_seed(0)
+    netG_A = networks.define_G(opt.input_nc, opt.output_nc, opt.ngf, args.netG_A, opt.norm,
+                               not opt.no_dropout, opt.init_type, opt.gpu_ids)
+    netG_B = networks.define_G(opt.output_nc, opt.input_nc, opt.ngf, args.netG_B, opt.norm,
+                               not opt.no_dropout, opt.init_type, opt.gpu_ids)
+    # BaseModel.run_generators, as called by backward_G, uses these
+    model.netG_A = netG_A
+    model.netG_B = netG_B
+    params = list(netG_A.parameters()) + list(netG_B.parameters())
+
+    def step(run, real_A, real_B):
+        for param in params:
+            param.grad = None
+        loss = generator_loss(run(real_A, real_B), real_A, real_B)
+        loss.backward()
+        if len(opt.gpu_ids) > 0:
+            torch.cuda.synchronize()
+        return loss.item(), [param.grad.clone() for param in params]
+
+    runs = [('6 separate calls', lambda real_A, real_B: separate_generators(netG_A, netG_B, real_A, real_B)),
+            ('3 batched calls', lambda real_A, real_B: model.run_generators(real_A, real_B, True))]
+    print('%s/%s, norm %s, batchSize %d, fineSize %d' % (args.netG_A, args.netG_B, opt.norm, opt.batchSize, opt.fineSize))
+    # square inputs, then B taller than A like unaligned scale_width batches
+    # (the batched calls fall back to one call per input)
+    for B_height in [opt.fineSize, opt.fineSize + opt.fineSize // 2]:
+        real_A = model.Tensor(opt.batchSize, opt.input_nc, opt.fineSize, opt.fineSize).uniform_(-1, 1)
+        real_B = model.Tensor(opt.batchSize, opt.output_nc, B_height, opt.fineSize).uniform_(-1, 1)
+        (loss, grads), (batched_loss, batched_grads) = [step(run, real_A, real_B) for _, run in runs]
+        # relative to the largest gradient: the conv biases in front of instance
+        # norm have zero gradients up to rounding noise
+        grad_scale = max(g.abs().max().item() for g in grads)
+        grad_diff = max((a - b).abs().max().item() for a, b in zip(grads, batched_grads)) / grad_scale
+        print('B %dx%d: loss %.8f vs %.8f, max gradient difference %.2e of the largest gradient' %
+              (B_height, opt.fineSize, loss, batched_loss, grad_diff))
+        assert abs(loss - batched_loss) <= 1e-5 * abs(loss) and grad_diff < 1e-4, 'batched generator calls change the loss'
+
+    real_A = model.Tensor(opt.batchSize, opt.input_nc, opt.fineSize, opt.fineSize).uniform_(-1, 1)
+    real_B = model.Tensor(opt.batchSize, opt.output_nc, opt.fineSize, opt.fineSize).uniform_(-1, 1)
+    for label, run in runs:
+        step(run, real_A, real_B)  # warm up
+        start_time = time.time()
+        for _ in range(args.repeat):
+            step(run, real_A, real_B)
+        print('%-16s: %.1f ms/step (forward + backward)' % (label, (time.time() - start_time) / args.repeat * 1000))
+
+
+def benchmark_feature_cache(args, argv):
+    from models.feature_cache import FeatureCache
+
+    class TinyNet(torch.nn.Module):
+        # stands in for VGG, one conv layer
+        def __init__(self):
+            super(TinyNet, self).__init__()
+            self.conv = torch.nn.Conv2d(3, 4, 3, padding=1)
+
+        def forward(self, x):
+            return [self.conv(x)]
+
+    torch.manual_seed(0)
+    net = TinyNet()
+    size = 8
+    images = torch.rand(args.num_images, 3, size, size) * 2 - 1
+    paths = ['%d.png' % i for i in range(args.num_images)]
+    entry_bytes = 4 * size * size * 4
+    cache = FeatureCache(net, None, 0, args.capacity * entry_bytes, (size, 0, 0, size))
+    g = torch.Generator()
+    g.manual_seed(0)
+    for step in range(args.num_steps):
+        # B paths are drawn with replacement, so a batch can repeat a path
+        batches = [torch.randint(args.num_images, (args.batch_size,), generator=g).tolist() for _ in range(2)]
+        features = cache([images[batch] for batch in batches], [[paths[i] for i in batch] for batch in batches])
+        for batch, feature in zip(batches, features):
+            assert (feature - cache.compute(images[batch])).abs().max() < 1e-6, 'cached features differ'
+        stored = sum(entry.nelement() * entry.element_size() for entry in cache.entries.values())
+        assert cache.nbytes == stored, 'nbytes %d, entries take %d bytes' % (cache.nbytes, stored)
+        assert len(cache.entries) <= args.capacity, 'cache over capacity'
+    print('%d steps, %d images, capacity %d: %d entries, %d bytes, hit rate %.2f' %
+          (args.num_steps, args.num_images, args.capacity, len(cache.entries), cache.nbytes,
+           cache.hits / float(cache.hits + cache.misses)))
+
+
+def separate_losses(dexined, lpips_loss, real_A, real_B, fake_B, fake_A):
+    # the DexiNed + LPIPS losses of DLP_GAN before batching
+    from models.transforms import trans_dexinet
+    losses = []
+    for real, fake in [(real_A, fake_B), (real_B, fake_A)]:
+        real_edges = dexined(trans_dexinet(real))[-1].repeat(1, 3, 1, 1)
+        fake_edges = dexined(trans_dexinet(fake))[-1].repeat(1, 3, 1, 1)
+        losses.append(lpips_loss(real_edges, fake_edges).mean())
+    return losses
+
+
+def batched_losses(dexined, lpips_loss, real_A, real_B, fake_B, fake_A):
+    from models.loss_networks import dexined_lpips
+    return dexined_lpips(dexined, lpips_loss, [real_A, real_B], [fake_B, fake_A])
+
+
+def count_convolutions(fn):
+    from torch.profiler import profile
+    with profile() as prof:
+        fn()
+    return sum(event.count for event in prof.key_averages() if event.key == 'aten::convolution')
+
+
+def load_loss_networks(opt, random_vgg):
+    # frozen DexiNed and LPIPS of DLP_GAN, in eval mode
+    import os
+    import lpips
+    from models.networks_.dexined import DexiNed
+
+    torch.manual_seed(0)
+    dexined = DexiNed()
+    weight_path = os.path.join(opt.model_dir, 'dexined.weight')
+    if os.path.isfile(weight_path):
+        dexined.load_state_dict(torch.load(weight_path, map_location='cpu'))
+    else:
+        print('%s not found, random DexiNed weights' % weight_path)
+    # random LPIPS trunk when the pretrained VGG cannot be downloaded
+    lpips_loss = lpips.LPIPS(net='vgg', pnet_rand=random_vgg, verbose=False)
+    for net in [dexined, lpips_loss]:
+        if len(opt.gpu_ids) > 0:
+            net.cuda(opt.gpu_ids[0])
+        net.eval()
+        for param in net.parameters():
+            param.requires_grad = False
+    return dexined, lpips_loss
+
+
+def benchmark_losses(args, argv):
+    from models.base_model import BaseModel
+    from models.transforms import fold_dexinet
+
+    opt = make_opt(argv)
+    model = BaseModel()
+    model.initialize(opt)
+    dexined, lpips_loss = load_loss_networks(opt, args.random_vgg)
+    folded_dexined = fold_dexinet(dexined)
+
+    real_A, real_B = [model.Tensor(opt.batchSize, 3, opt.fineSize, opt.fineSize).uniform_(-1, 1) for _ in range(2)]
+    fakes = [model.Tensor(opt.batchSize, 3, opt.fineSize, opt.fineSize).uniform_(-1, 1).requires_grad_() for _ in range(2)]
+
+    def step(run):
+        for fake in fakes:
+            fake.grad = None
+        losses = run()
+        sum(losses).backward()
+        if len(opt.gpu_ids) > 0:
+            torch.cuda.synchronize()
+        return [loss.item() for loss in losses], [fake.grad.clone() for fake in fakes]
+
+    runs = [('separate passes', lambda: separate_losses(dexined, lpips_loss, real_A, real_B, *fakes)),
+            ('batched passes', lambda: batched_losses(folded_dexined, lpips_loss, real_A, real_B, *fakes))]
+    (losses, grads), (batched_loss_values, batched_grads) = [step(run) for _, run in runs]
+    # relative norm: the folded first conv rounds differently, which can flip
+    # single ReLU/max-pool decisions and move the gradient of a few pixels
+    grad_diff = max(((a - b).norm() / a.norm()).item() for a, b in zip(grads, batched_grads))
+    print('DexiNed + LPIPS losses, batchSize %d, fineSize %d' % (opt.batchSize, opt.fineSize))
+    print('losses %s vs %s, gradient difference %.2e (relative norm)' %
+          (', '.join('%.6f' % l for l in losses), ', '.join('%.6f' % l for l in batched_loss_values), grad_diff))
+    assert all(abs(a - b) <= 1e-4 * abs(a) for a, b in zip(losses, batched_loss_values)) and grad_diff < 1e-3, \
+        'batched loss network passes change the losses'
+
+    for label, run in runs:
+        step(run)  # warm up
+        convolutions = count_convolutions(lambda: step(run))
+        start_time = time.time()
+        for _ in range(args.repeat):
+            step(run)
+        print('%-16s: %.1f ms/step (forward + backward), %d convolution launches (profiler)' %
+              (label, (time.time() - start_time) / args.repeat * 1000, convolutions))
+
+
+def benchmark_fold(args, argv):
+    from models.base_model import BaseModel
+    from models import transforms as T
+
+    opt = make_opt(argv)
+    model = BaseModel()
+    model.initialize(opt)
+    dexined, lpips_loss = load_loss_networks(opt, args.random_vgg)
+    # two sizes, the border correction depends on the input size
+    sizes = [(opt.fineSize, opt.fineSize), (opt.fineSize, opt.fineSize + 16)]
+    print('batchSize %d, sizes %s' % (opt.batchSize, sizes))
+    for label, net, transform, fold in [('VGG16', lpips_loss.net, T.trans_vgg, T.fold_vgg),
+                                        ('DexiNed', dexined, T.trans_dexinet, T.fold_dexinet)]:
+        folded = fold(net)
+        for size in sizes:
+            x = model.Tensor(opt.batchSize, 3, *size).uniform_(-1, 1)
+            with torch.no_grad():
+                outputs = net(transform(x))
+                folded_outputs = folded(x)
+            diff = max(((a - b).abs().max() / a.abs().max()).item() for a, b in zip(outputs, folded_outputs))
+            print('%-8s %dx%d: max output difference %.2e of the largest output' % ((label,) + size + (diff,)))
+            assert diff < 1e-4, 'folded %s differs from %s(transform(x))' % (label, label)
+
+        x = model.Tensor(opt.batchSize, 3, opt.fineSize, opt.fineSize).uniform_(-1, 1)
+        runs = [('transform + net', lambda: net(transform(x))), ('folded', lambda: folded(x))]
+        for run_label, run in runs:
+            with torch.no_grad():
+                run()  # warm up
+                start_time = time.time()
+                for _ in range(args.repeat):
+                    run()
+                if len(opt.gpu_ids) > 0:
+                    torch.cuda.synchronize()
+            print('%-8s %-16s: %.1f ms/forward' % (label, run_label, (time.time() - start_time) / args.repeat * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark')
+
+    decode_parser = subparsers.add_parser('decode', help='JPEG full vs draft (DCT scaled) decoding')
+    decode_parser.add_argument('--dataroot', type=str, required=True, help='folder of images to decode')
+    decode_parser.add_argument('--loadSize', type=int, default=286, help='scale images to this size')
+    decode_parser.add_argument('--num_images', type=int, default=200, help='# images to decode')
+    decode_parser.add_argument('--repeat', type=int, default=3, help='# timed runs, the best is reported')
+    decode_parser.set_defaults(func=lambda args, argv: benchmark_decode(args))
+
+    transport_parser = subparsers.add_parser('transport', help='float32 vs uint8 sample transport from the workers')
+    transport_parser.add_argument('--num_steps', type=int, default=100, help='# timed loader steps')
+    transport_parser.set_defaults(func=benchmark_transport)
+
+    aligned_parser = subparsers.add_parser('aligned', help='AlignedDataset per-sample latency, tensor vs uint8 crop')
+    aligned_parser.add_argument('--num_images', type=int, default=200, help='# samples to time')
+    aligned_parser.set_defaults(func=benchmark_aligned)
+
+    decoders_parser = subparsers.add_parser('decoders', help='PIL vs OpenCV vs torchvision decoding, records the fastest for --decoder auto')
+    decoders_parser.add_argument('--num_images', type=int, default=50, help='# images per file type to decode')
+    decoders_parser.add_argument('--repeat', type=int, default=3, help='# timed runs, the best is reported')
+    decoders_parser.set_defaults(func=benchmark_decoders)
+
+    generators_parser = subparsers.add_parser('generators', help='backward_G generator calls, separate vs batched, and checks that the loss is unchanged')
+    generators_parser.add_argument('--netG_A', type=str, default='DLP_GAN_G_A', help='generator A architecture')
+    generators_parser.add_argument('--netG_B', type=str, default='DLP_GAN_G_B', help='generator B architecture')
+    generators_parser.add_argument('--repeat', type=int, default=5, help='# timed steps')
+    generators_parser.set_defaults(func=benchmark_generators)
+
+    cache_parser = subparsers.add_parser('feature_cache', help='FeatureCache with repeated paths in a batch, checks the features and the byte count of the entries')
+    cache_parser.add_argument('--num_images', type=int, default=6, help='# distinct image paths')
+    cache_parser.add_argument('--capacity', type=int, default=4, help='# features the cache can hold')
+    cache_parser.add_argument('--batch_size', type=int, default=3, help='# images per domain and step')
+    cache_parser.add_argument('--num_steps', type=int, default=50, help='# simulated steps')
+    cache_parser.set_defaults(func=benchmark_feature_cache)
+
+    losses_parser = subparsers.add_parser('losses', help='DLP_GAN DexiNed + LPIPS losses, separate vs batched loss network passes, and checks that the losses are unchanged')
+    losses_parser.add_argument('--random_vgg', action='store_true', help='random LPIPS VGG trunk (no download)')
+    losses_parser.add_argument('--repeat', type=int, default=5, help='# timed steps')
+    losses_parser.set_defaults(func=benchmark_losses)
+
+    fold_parser = subparsers.add_parser('fold', help='VGG/DexiNed with the input normalization folded into the first conv, checks the outputs against transform + net')
+    fold_parser.add_argument('--random_vgg', action='store_true', help='random LPIPS VGG trunk (no download)')
+    fold_parser.add_argument('--repeat', type=int, default=5, help='# timed forward passes')
+    fold_parser.set_defaults(func=benchmark_fold)
+
+    # the remaining arguments are training options
+    args, argv = parser.parse_known_args()
+    if args.benchmark is None:
+        parser.print_help()
+    else:
+        args.func(args, argv)
@@ -0,0 +1,123 @@
+###############################################################################
+# Per-channel dataset statistics in one parallel pass.
+# Every worker accumulates count, mean and the sum of squared deviations (M2)
+# per channel (Welford) plus min/max and 256-bin histograms over a chunk of
+# images; the partial results are merged with Chan's formula, so mean and std
+# are exact for the pooled pixels of the whole domain, not averages of
+# per-image values.
+#
+# Usage:
+#   python -m util.dataset_stats --dataroot ./datasets/dlp_gan --phase train --nThreads 16
+# writes <dataroot>/<phase>_stats.json with an entry per domain (trainA,
+# trainB). mean and std are on the [0, 1] scale taken by
+# transforms.Normalize(mean, std).
+###############################################################################
+
+import argparse
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from data.image_folder import make_dataset, default_loader
+from data.zip_folder import is_zip_path
+
+
+class RunningStats():
+    def __init__(self, channels=3):
+        self.num_images = 0
+        self.count = 0
+        self.mean = np.zeros(channels)
+        self.m2 = np.zeros(channels)
+        self.min = np.full(channels, 255)
+        self.max = np.zeros(channels, dtype=np.int64)
+        self.histogram = np.zeros((channels, 256), dtype=np.int64)
+
+    def update(self, img):
+        """Add the pixels of an HxWxC uint8 image."""
+        pixels = img.reshape(-1, img.shape[-1])
+        other = RunningStats(pixels.shape[1])
+        other.num_images = 1
+        other.count = pixels.shape[0]
+        values = pixels.astype(np.float64)
+        other.mean = values.mean(0)
+        other.m2 = ((values - other.mean) ** 2).sum(0)
+        other.min = pixels.min(0).astype(np.int64)
+        other.max = pixels.max(0).astype(np.int64)
+        for c in range(pixels.shape[1]):
+            other.histogram[c] = np.bincount(pixels[:, c], minlength=256)
+        self.merge(other)
+
+    def merge(self, other):
+        """Chan et al. parallel update of count, mean and M2."""
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.num_images += other.num_images
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.histogram += other.histogram
+        return self
+
+    def result(self):
+        return {'num_images': self.num_images,
+                'num_pixels': self.count,
+                'mean': (self.mean / 255.0).tolist(),
+                'std': (np.sqrt(self.m2 / max(self.count, 1)) / 255.0).tolist(),
+                'min': self.min.tolist(),
+                'max': self.max.tolist(),
+                'histogram': self.histogram.tolist()}
+
+
+def _chunk_stats(args):
+    paths, load_size = args
+    stats = RunningStats()
+    for path in paths:
+        img = default_loader(path, (load_size, load_size) if load_size > 0 else None)
+        if load_size > 0:
+            img = img.resize((load_size, load_size), Image.BICUBIC)
+        stats.update(np.asarray(img))
+    return stats
+
+
+def dataset_stats(paths, load_size=0, num_workers=None, chunk_size=16):
+    """Statistics of the RGB pixels of all images in paths, resized to
+    load_size x load_size first if load_size > 0."""
+    chunks = [(paths[i:i + chunk_size], load_size) for i in range(0, len(paths), chunk_size)]
+    stats = RunningStats()
+    with Pool(num_workers) as pool:
+        for partial in pool.imap_unordered(_chunk_stats, chunks):
+            stats.merge(partial)
+    return stats.result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--dataroot', type=str, required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--loadSize', type=int, default=0, help='resize images to loadSize x loadSize first, like the datasets do; 0 keeps the original size')
+    parser.add_argument('--nThreads', type=int, default=os.cpu_count(), help='# worker processes')
+    args = parser.parse_args()
+
+    results = {}
+    for domain in ['A', 'B']:
+        dir = os.path.join(args.dataroot, args.phase + domain)
+        if not os.path.isdir(dir) and not is_zip_path(dir):
+            continue
+        paths = sorted(make_dataset(dir))
+        results[args.phase + domain] = stats = dataset_stats(paths, args.loadSize, args.nThreads)
+        print('%s: %d images' % (args.phase + domain, stats['num_images']))
+        print('  transforms.Normalize(mean=(%.4f, %.4f, %.4f), std=(%.4f, %.4f, %.4f))' %
+              tuple(stats['mean'] + stats['std']))
+        print('  min %s, max %s' % (stats['min'], stats['max']))
+
+    save_path = os.path.join(args.dataroot, '%s_stats.json' % args.phase)
+    with open(save_path, 'w') as f:
+        json.dump(results, f)
+    print('saved %s' % save_path)
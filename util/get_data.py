@@ -49,7 +49,7 @@ class GetData(object):
         if self._verbose:
             print(text)
 
-    def _download_data(self, dataset_url, save_path, filename=None):
+    def _download_data(self, dataset_url, save_path, filename=None, extract=True):
         if not isdir(save_path):
             os.makedirs(save_path)
 
@@ -83,6 +83,9 @@ class GetData(object):
             else:
                 f.write(r.content)
 
+        if not extract:
+            return temp_save_path
+
         if base.endswith('.tar.gz'):
             obj = tarfile.open(temp_save_path)
         elif base.endswith('.zip'):
@@ -140,18 +143,33 @@ class GetData(object):
 
         return abspath(save_path_full)
 
-    def get_dlp_gan_dataset(self, save_path):
+    def get_dlp_gan_dataset(self, save_path, extract=True):
         """
         Download the Chinese Landscape Painting Dataset from GitHub.
         
         Args:
             save_path : str
                 A directory to save the data to.
+            extract : bool
+                If False, keep the downloaded archive as '<save_path>.zip' and
+                return the path of the paintings inside it. make_dataset and
+                the datasets read such paths directly (see data/zip_folder.py).
                 
         Returns:
             save_path_full : str
                 The absolute path to the downloaded data.
         """
+        if not extract:
+            archive_path = save_path.rstrip(os.sep) + '.zip'
+            if os.path.isfile(archive_path):
+                warn("\n'{0}' already exists. Voiding Download.".format(archive_path))
+            else:
+                self._print('Downloading DLP GAN Dataset from GitHub...')
+                url = self.url_dict['traditional_chinese_landscape_painting']
+                self._download_data(url, save_path=os.path.dirname(archive_path) or '.',
+                                    filename=basename(archive_path), extract=False)
+            return join(abspath(archive_path), 'Chinese-Landscape-Painting-Dataset-main', 'All-Paintings')
+
         if isdir(save_path):
             warn("\n'{0}' already exists. Voiding Download.".format(save_path))
         else:
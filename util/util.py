@@ -9,10 +9,10 @@ import collections
 
 # Converts a Tensor into a Numpy array
 # |imtype|: the desired type of the converted numpy array
-def tensor2im(image_tensor, imtype=np.uint8):
+def tensor2im(image_tensor, imtype=np.uint8, index=0):
     #print (image_tensor) #3,256,256
     #print ('=====')
-    image_numpy = image_tensor[0].cpu().float().numpy()
+    image_numpy = image_tensor[index].cpu().float().numpy()
     if image_numpy.shape[0] == 1:
         image_numpy = np.tile(image_numpy, (3, 1, 1))
     image_numpy = (np.transpose(image_numpy, (1, 2, 0)) + 1) / 2.0 * 255.0
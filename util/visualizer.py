@@ -114,8 +114,12 @@ class Visualizer():
             win=self.display_id)
 
     # errors: same format as |errors| of plotCurrentErrors
-    def print_current_errors(self, epoch, i, errors, t):
-        message = '(epoch: %d, iters: %d, time: %.3f) ' % (epoch, i, t)
+    # data_fraction: share of the wall time spent waiting for the data loader
+    def print_current_errors(self, epoch, i, errors, t, data_fraction=None):
+        message = '(epoch: %d, iters: %d, time: %.3f' % (epoch, i, t)
+        if data_fraction is not None:
+            message += ', data: %.0f%%' % (data_fraction * 100)
+        message += ') '
         for k, v in errors.items():
             message += '%s: %.3f ' % (k, v)
 